@@ -4,8 +4,8 @@ Esse módulo define os endpoints da API:
 • GET /api/v1/books: Lista todos os livros disponíveis na base de dados. 
 • GET /api/v1/books/{id}: Retorna detalhes completos de um livro 
 específico pelo ID. 
-• GET /api/v1/books/search?title={title}&category={category}: Busca 
-livros por título e/ou categoria. 
+• GET /api/v1/books/search?title={title}&category={category}&limit={limit}: Busca 
+livros por título (parcial ou aproximado) e/ou categoria, por relevância. 
 • GET /api/v1/categories: Lista todas as categorias de livros disponíveis. 
 • GET /api/v1/health: Verifica status da API e conectividade com os 
 dados. 
@@ -13,14 +13,19 @@ dados.
 livros, preço médio, distribuição de ratings). 
 • GET /api/v1/stats/categories: Estatísticas detalhadas por categoria 
 (quantidade de livros, preços por categoria). 
-• GET /api/v1/books/top-rated: Lista os livros com melhor avaliação 
+• GET /api/v1/books/top-rated?k={k}&category={category}: Lista os livros com melhor avaliação 
 (rating mais alto). 
 • GET /api/v1/books/price-range?min={min}&max={max}: Filtra livros 
 dentro de uma faixa de preço específica.
 
-• GET /api/v1/ml/features - Dados formatados para features. 
-• GET /api/v1/ml/training-data - Dataset para treinamento. 
+• GET /api/v1/ml/features - Dados formatados para features (json, ndjson, csv ou arrow). 
+• GET /api/v1/ml/training-data?split={split}&format={format}&offset={offset}&limit={limit} - Dataset 
+para treinamento, com divisão treino/validação reproduzível e envio em streaming. 
 • POST /api/v1/ml/predictions - Endpoint para receber predições.
+• POST /api/v1/ml/predictions/batch - Predições de várias linhas (array JSON ou NDJSON) numa única requisição.
+
+• GET /api/v1/metrics - Histogramas de latência e tamanho das respostas (formato Prometheus). 
+• GET /api/v1/metrics/summary - Resumo por rota (percentis, bytes, etapas internas). 
 
 • POST /api/v1/auth/login - Gera um token usado para acessar rotas protegidas. 
 • GET /api/v1/ml/scraping/trigger - endpoint protegido que simula um ativador do scraping. 
@@ -36,22 +41,148 @@ a database com logs é um banco postgresSQL instanciada com o NEON
 o deploy da API foi feito usando Heroku
 o deploy do dashboard com logs foi feito usando streamlit
 
+Inicialização: importar este módulo só monta o app. O dataset e o modelo de
+ML são carregados no lifespan (ou no master do gunicorn, ver gunicorn.conf.py),
+e o scraping, a autenticação (jose/passlib), o pyarrow e o SQLAlchemy dos logs
+são importados no primeiro uso. bench/startup.py mede o tempo de import e até a primeira
+requisição.
+
 '''
 from dotenv import load_dotenv
 load_dotenv()  # Esta função carrega as variáveis do arquivo .env
 
-from fastapi import FastAPI, HTTPException, APIRouter, Depends
+from contextlib import asynccontextmanager
+from functools import cache
+from typing import Literal
+import asyncio
+import json
+import math
+import os
+from fastapi import FastAPI, HTTPException, APIRouter, Depends, Request, Query
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from basemodels import Book, PredictionInput
-import pandas as pd
-from ml_model import fake_model 
-from auth_utils import get_current_user, authenticate_user, verify_password, create_access_token
+from basemodels import Book, BookPage, PredictionInput
+import numpy as np
+from ml_model import LinearModel, MicroBatcher, feature_matrix, load_model
+from auth_utils import get_current_user, authenticate_user_async, login_throttle, create_access_token, throttle_ip
 from basemodels import LoggingMiddleware
-from scraping import run
+from jobs import JobManager
+from catalog import CatalogHolder, CatalogStore, encode_cursor
+from cache_utils import ResponseCache, etag_matches
+from metrics import registry as metrics_registry, stage
+from records import dumps
+from training import FEATURE_COLUMNS, MEDIA_TYPES, TRAINING_COLUMNS, formats, iter_export
+
+# respostas da coleção inteira já serializadas, por versão do dataset
+response_cache = ResponseCache()
+
+
+# respostas guardadas no response_cache e como gerá-las a partir de um snapshot
+CACHED_RESPONSES = {
+    'books': lambda store: store.records,
+    'categories': lambda store: store.categories,
+    'stats/overview': lambda store: store.stats.overview(),
+    'stats/categories': lambda store: store.stats.categories(),
+}
+
+
+def warm_cache(store: CatalogStore):
+    '''Serializa as respostas da nova versão antes de ela passar a ser servida.'''
+    response_cache.invalidate(store.version)
+    for key, build in CACHED_RESPONSES.items():
+        response_cache.get(key, store.version, lambda: build(store))
+
+
+def cached(request: Request, store: CatalogStore, key: str):
+    with stage('serializacao'):
+        return response_cache.respond(request, key, store.version, lambda: CACHED_RESPONSES[key](store))
+
+
+# snapshot atual do dataset (data/ no formato colunar, ou books.csv), recarregado
+# quando uma nova versão é publicada
+catalog = CatalogHolder('books.csv', os.getenv('BOOKS_DATA_DIR', 'data'),
+                        poll_interval=float(os.getenv('CATALOG_POLL_INTERVAL', 5)))
+catalog.on_swap(warm_cache)
+
+# com o gunicorn (gunicorn.conf.py) quem observa o dataset é o master: ele carrega
+# cada nova versão e recicla os workers; sem ele, cada processo recarrega sozinho
+RELOAD_IN_MASTER = os.getenv('CATALOG_RELOAD') == 'master'
+
+
+# modelo carregado uma única vez, no lifespan (ou no primeiro uso), e não no import
+@cache
+def prediction_model() -> LinearModel:
+    return load_model(os.getenv('MODEL_PATH', 'model.json'))
+
+
+# predições de uma linha feitas ao mesmo tempo são agrupadas numa única chamada vetorizada
+prediction_batcher = MicroBatcher(lambda X: prediction_model().predict(X))
+
+
+def preload():
+    '''Carrega o dataset (idempotente: se nada mudou, só confere o arquivo) e o modelo.'''
+    catalog.reload_if_changed()
+    prediction_model()
+
+def publish_new_version():
+    '''Ao fim do scraping: recarrega aqui ou deixa para o master do gunicorn (RELOAD_IN_MASTER).'''
+    if not RELOAD_IN_MASTER:
+        catalog.reload_if_changed()
+
+
+def run_scraping(progress=None) -> float:
+    # o módulo de scraping (httpx, BeautifulSoup, parsers) só é importado no primeiro job
+    from scraping import run
+    return run(progress=progress)
+
+
+# jobs de scraping executados em segundo plano; ao terminar, a nova versão é publicada
+scraping_jobs = JobManager(run_scraping, on_success=publish_new_version,
+                           lock_path=os.getenv('SCRAPER_LOCK_PATH', '.scraping.lock'),
+                           state_path=os.getenv('SCRAPER_JOBS_PATH', '.scraping_jobs.json'))
+
+# quantidade de linhas agrupadas em cada pedaço enviado no modo NDJSON
+NDJSON_CHUNK_SIZE = 500
+
+
+def iter_ndjson(rows):
+    '''Serializa as linhas sob demanda, em pedaços de NDJSON_CHUNK_SIZE.'''
+    chunk = []
+    for row in rows:
+        chunk.append(dumps(row))
+        if len(chunk) >= NDJSON_CHUNK_SIZE:
+            yield b'\n'.join(chunk) + b'\n'
+            chunk = []
+    if chunk:
+        yield b'\n'.join(chunk) + b'\n'
+
+
+def json_response(content) -> Response:
+    '''
+    Serializa direto dos BookRecords (records.dumps). Como a rota devolve um
+    Response, o FastAPI não passa o conteúdo pelo jsonable_encoder nem pela
+    validação do response_model, que fica só para a documentação.
+    '''
+    with stage('serializacao'):
+        return Response(dumps(content), media_type='application/json')
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # o dataset é carregado antes da primeira requisição, fora do event loop
+    await asyncio.to_thread(preload)
+    # sem o gunicorn, a thread que observa o dataset roda no próprio processo; com
+    # ele, os workers não recarregam: são substituídos a cada versão (gunicorn.conf.py)
+    if not RELOAD_IN_MASTER:
+        catalog.start_watching()
+    yield
+    catalog.stop_watching()
+    # as últimas requisições deste worker entram no /metrics dos outros
+    if metrics_registry.directory:
+        metrics_registry.flush()
 
-books = pd.read_csv('books.csv')
 
 app = FastAPI(
+    lifespan=lifespan,
     title = 'API para consulta de livros',
     version='1.0.0',
     description=(
@@ -78,108 +209,197 @@ async def home():
 
 # POST /login to get JWT token
 @router.post("/auth/login", tags=['LOGIN'], summary='Autentica um usuário e retorna um token JWT.')
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     """
     Recebe credenciais de usuário (username e password) via formulário OAuth2.
+
+    Tentativas demais para o mesmo usuário ou do mesmo IP numa janela de tempo
+    recebem 429, com o cabeçalho Retry-After.
     """
-    user = authenticate_user(form_data.username, form_data.password)
+    user_key = f"user:{form_data.username}"
+    ip = throttle_ip(request.client.host if request.client else None, request.headers.get('x-forwarded-for'))
+    keys = [user_key] if ip is None else [user_key, f"ip:{ip}"]
+    # o limite fica num arquivo SQLite compartilhado pelos workers: consultado fora do event loop
+    retry_after = await asyncio.to_thread(login_throttle.hit, *keys)
+    if retry_after:
+        raise HTTPException(status_code=429, detail="Muitas tentativas de login, tente novamente mais tarde",
+                            headers={"Retry-After": str(math.ceil(retry_after))})
+
+    user = await authenticate_user_async(form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Usuário ou senha incorretos")
+    await asyncio.to_thread(login_throttle.reset, user_key)
     access_token = create_access_token(data={"sub": user["username"]})
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 # GET /protected that requires JWT token
-@router.get("/scraping/trigger", tags=['ADMIN'], summary='Inicia o processo de scraping (requer autenticação).')
+@router.get("/scraping/trigger", tags=['ADMIN'], status_code=202, summary='Inicia o processo de scraping (requer autenticação).')
 async def protected_route(current_user: str = Depends(get_current_user)):
     """
     Este é um endpoint protegido que inicia o processo de web scraping
     do site 'books.toscrape.com' para atualizar a base de dados.
+
+    O scraping roda em segundo plano: a resposta traz o id do job, que pode ser
+    acompanhado em `/api/v1/scraping/jobs/{job_id}`. Se já houver um scraping
+    em andamento, o mesmo job é retornado.
     """
     try:
-        duration = run()
-        return {
-            "message": f"Olá, {current_user}. Scraping realizado.",
-            "status": "success",
-            "duration": f'{duration:.1f} segundos'
-        }
+        # o submit pode esperar o lock e ler o estado de outro processo: fora do event loop
+        job, created = await asyncio.to_thread(scraping_jobs.submit)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Falha no scraping: {type(e).__name__} - {str(e)}"
         )
+    return {
+        "message": f"Olá, {current_user}. Scraping {'iniciado' if created else 'já em andamento'}.",
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"{router.prefix}/scraping/jobs/{job.id}"
+    }
 
 
-@router.get('/books', tags=['BOOKS'], summary='Lista todos os livros disponíveis.')
-async def get_items():
+@router.get("/scraping/jobs/{job_id}", tags=['ADMIN'], summary='Consulta o progresso de um job de scraping (requer autenticação).')
+async def get_scraping_job(job_id: str, current_user: str = Depends(get_current_user)):
+    """
+    Retorna o status do job, as páginas baixadas, os livros processados,
+    os erros e o tempo decorrido.
+    """
+    job = await asyncio.to_thread(scraping_jobs.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='job nao encontrado')
+    return job.to_dict()
+
+
+@router.get('/books', tags=['BOOKS'], response_model=list[Book] | BookPage, summary='Lista todos os livros disponíveis.')
+async def get_items(
+    request: Request,
+    limit: int | None = Query(None, ge=1, le=1000, description='Quantidade máxima de livros por página'),
+    cursor: str | None = Query(None, description='Cursor retornado em `next_cursor` pela página anterior'),
+    fields: str | None = Query(None, description='Campos separados por vírgula, ex: `id,title,price`'),
+    format: Literal['json', 'ndjson'] = Query('json', description='`ndjson` envia um livro por linha, em streaming'),
+):
     """
 
     Retorna uma lista completa de todos os livros que foram capturados pelo scraping.
+
+    Com `limit` e/ou `cursor` a resposta é paginada no formato
+    `{"items": [...], "next_cursor": ...}`; `next_cursor` é nulo na última página.
+    Com `format=ndjson` os livros são enviados um por linha, e o cursor da
+    próxima página vem no header `X-Next-Cursor`.
     """
-    return books.to_dict(orient='records')
+    store = catalog.current()
+    if limit is None and cursor is None and fields is None and format == 'json':
+        return cached(request, store, 'books')
+
+    selected = None
+    if fields is not None:
+        selected = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = [field for field in selected if field not in store.columns]
+        if unknown or not selected:
+            raise HTTPException(status_code=400, detail=f'campos inválidos: {", ".join(unknown)}')
+
+    try:
+        start = store.position_after(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    stop = len(store) if limit is None else min(start + limit, len(store))
+    next_cursor = encode_cursor(store.records[stop - 1].id, stop - 1) if start < stop < len(store) else None
+    rows = store.iter_records(start, stop, selected)
+
+    if format == 'ndjson':
+        headers = {'X-Next-Cursor': next_cursor} if next_cursor else {}
+        return StreamingResponse(iter_ndjson(rows), media_type='application/x-ndjson', headers=headers)
+
+    with stage('consulta'):
+        items = list(rows)
+    return json_response({"items": items, "next_cursor": next_cursor})
 
 
-@router.get('/books/search', tags=['BOOKS'], summary='Busca um livro específico por título e categoria.')
-async def get_book_by_name(title:str, category:str):
+@router.get('/books/search', tags=['BOOKS'], response_model=list[Book], summary='Busca livros por título e/ou categoria.')
+async def get_book_by_name(
+    title: str | None = Query(None, description='Título completo ou parcial (tolera erros de digitação)'),
+    category: str | None = Query(None, description='Restringe a busca a uma categoria'),
+    limit: int = Query(10, ge=1, le=100, description='Quantidade máxima de livros'),
+):
     """
-    A busca não é sensível a maiúsculas/minúsculas nem a espaços
+    A busca não é sensível a maiúsculas/minúsculas, acentos nem a espaços
     em branco no início/fim dos parâmetros.
+
+    Retorna os livros ordenados por relevância: títulos iguais ao buscado
+    primeiro, depois os que casam com mais palavras (por palavra inteira,
+    prefixo ou aproximação). Só com `category`, lista os livros da categoria.
     """
+    if not title and not category:
+        raise HTTPException(status_code=400, detail='informe title e/ou category')
 
-    filtered_books = books[
-        (books['title'].str.strip().str.lower() == title.strip().lower()) &
-        (books['category'].str.strip().str.lower() == category.strip().lower())
-    ]
+    store = catalog.current()
+    with stage('consulta'):
+        if title:
+            books = store.search_titles(title, category, limit)
+        else:
+            books = store.in_category(category, limit)
 
-    if filtered_books.empty:
+    if not books:
         raise HTTPException(status_code=404, detail='item nao encontrado')
-    return filtered_books.to_dict(orient='records')[0]
+    return json_response(books)
 
 
 @router.get('/categories', tags=['BOOKS'], summary='Lista todas as categorias de livros existentes.')
-async def get_categories():
+async def get_categories(request: Request):
     """
     Retorna uma lista de strings, onde cada string é uma categoria única
     """
 
     try:
-        return books['category'].dropna().unique().tolist()
+        return cached(request, catalog.current(), 'categories')
     
     except Exception as e:
         raise HTTPException(status_code=404, detail='coleção nao encontrada')
 
 
-@router.get('/books/top-rated', tags=['INSIGHTS'], summary='Retorna os 30 livros mais bem avaliados.')
-async def get_top_rated_books():
+@router.get('/books/top-rated', tags=['INSIGHTS'], response_model=list[Book], summary='Retorna os livros mais bem avaliados.')
+async def get_top_rated_books(
+    k: int = Query(30, ge=1, le=1000, description='Quantidade de livros'),
+    category: str | None = Query(None, description='Restringe a uma categoria'),
+):
     """
     A lista é ordenada por 'rating' (avaliação), 'price' (preço) e 'availability' (disponibilidade)
+
+    A ordenação é calculada uma vez por versão do dataset (também por categoria),
+    então a consulta custa O(k).
     """
-    try:
-        return  books.sort_values(by=['rating','price','availability'], ascending=False).head(30).to_dict(orient='records')
-    
-    except Exception as e:
-        raise HTTPException(status_code=404, detail=f"nenhum livro encontrado: {str(e)}")
+    with stage('consulta'):
+        books = catalog.current().top_rated(k, category)
+    if books is None:
+        raise HTTPException(status_code=404, detail=f"nenhum livro encontrado: categoria '{category}' não existe")
+    return json_response(books)
     
 
-@router.get('/books/price-range', tags=['INSIGHTS'], summary='Filtra livros por um intervalo de preço.')
+@router.get('/books/price-range', tags=['INSIGHTS'], response_model=list[Book], summary='Filtra livros por um intervalo de preço.')
 async def get_book_by_price(min:float, max:float):
     """
     Retorna todos os livros cujo preço esteja entre o valor `min_price` e `max_price`,
     incluindo os limites.
     """
     try:
-        return books[(books['price']>=min) & (books['price']<=max)].to_dict(orient='records')
+        with stage('consulta'):
+            books = catalog.current().price_range(min, max)
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Nenhum livro encontrado nesse intervalo de preço: {str(e)}")
+    return json_response(books)
 
 
-@router.get('/books/{id}', tags=['BOOKS'], summary='Busca um único livro pelo seu ID.')
+@router.get('/books/{id}', tags=['BOOKS'], response_model=Book, summary='Busca um único livro pelo seu ID.')
 async def get_book(id:str):
 
-    book = books[books['id'] == id]
-    if book.empty:
+    with stage('consulta'):
+        book = catalog.current().get(id)
+    if book is None:
         raise HTTPException(status_code=404, detail='item nao encontrado')
-    return book.to_dict(orient='records')[0]
+    return json_response(book)
 
 
 @router.get('/health', tags=['HEALTH'], summary='Verifica a saúde e o estado da API.')
@@ -190,71 +410,172 @@ async def health_check():
     """
     try:
 
-        total_books = len(books)
+        store = catalog.current()
         return {
             "status": "ok",
             "mensagem": "API está funcionando corretamente",
-            "total de livros": total_books
+            "total de livros": len(store),
+            "versão do dataset": store.version
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Health check falhou: {str(e)}")
 
 
 @router.get('/stats/overview', tags=['INSIGHTS'], summary='Fornece um resumo estatístico da coleção de livros.')
-async def stats_overview():
+async def stats_overview(request: Request):
     """
     Calcula e retorna o número total de livros, o preço médio de todos os livros,
     e a contagem de livros para cada nota de avaliação (de 1 a 5 estrelas).
+
+    Também traz preço mínimo, máximo e percentis, e o estoque total. Os valores
+    são calculados uma vez por versão do dataset.
     """
     try:
 
-        return {
-            "total de livros": len(books),
-            "preço médio": books['price'].mean(),
-            "ratings": books['rating'].value_counts().to_dict()
-        }
+        return cached(request, catalog.current(), 'stats/overview')
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"coleção nao encontrada: {str(e)}")
 
+@router.get('/stats/categories', tags=['INSIGHTS'], summary='Fornece estatísticas detalhadas por categoria.')
+async def stats_categories(request: Request):
+    """
+    Para cada categoria retorna a quantidade de livros, o preço médio, mínimo,
+    máximo e percentis, a distribuição de ratings e o estoque.
+    """
+    try:
+
+        return cached(request, catalog.current(), 'stats/categories')
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=f"coleção nao encontrada: {str(e)}")
+
+ExportFormat = Literal['json', 'ndjson', 'csv', 'arrow']
+
+
+def export_rows(request: Request, store: CatalogStore, name: str, positions, columns: dict,
+                format: str, offset: int, limit: int | None, version: str | None):
+    """
+    Envia em streaming as linhas das posições dadas (a partir de `offset`). O
+    cabeçalho X-Next-Offset indica de onde continuar quando ainda há linhas.
+    """
+    if format not in formats():
+        raise HTTPException(status_code=400, detail=f'formato {format} indisponível')
+    if version is not None and version != store.version:
+        raise HTTPException(status_code=409, detail='a versão do dataset mudou, recomece do offset 0')
+
+    stop = len(positions) if limit is None else min(offset + limit, len(positions))
+    headers = {
+        'ETag': f'"{store.version}-{name}-{format}-{offset}-{stop}"',
+        'Cache-Control': 'no-cache',
+        'X-Dataset-Version': store.version,
+        'X-Total-Count': str(len(positions)),
+    }
+    if stop < len(positions):
+        headers['X-Next-Offset'] = str(stop)
+    if etag_matches(request.headers.get('if-none-match'), headers['ETag']):
+        return Response(status_code=304, headers=headers)
+
+    rows = iter_export(store.frame, positions[offset:stop], columns, format)
+    return StreamingResponse(rows, media_type=MEDIA_TYPES[format], headers=headers)
+
+
 @router.get('/ml/features', tags=['ML READY'], summary='Extrai features prontas para modelos de Machine Learning.')
-async def get_features():
+async def get_features(
+    request: Request,
+    format: ExportFormat = Query('json', description='json, ndjson, csv ou arrow (Arrow IPC)'),
+    offset: int = Query(0, ge=0, description='Posição da primeira linha'),
+    limit: int | None = Query(None, ge=1, description='Quantidade máxima de linhas'),
+    version: str | None = Query(None, description='Versão do dataset esperada (X-Dataset-Version)'),
+):
     """
     Retorna um conjunto de dados simplificado contendo apenas as features
     `availability` e `rating`, que podem ser usadas para treinar um modelo de ML.
     """
-    try: 
-        features = pd.DataFrame()
-        features[['x1_availability','x2_rating']] = books[['availability','rating']]
-        return features.to_dict(orient='records')
-    
-    except Exception as e:
-        raise HTTPException(status_code=404, detail='coleção não encontradas')
+    store = catalog.current()
+    positions = np.arange(len(store.records))
+    return export_rows(request, store, 'features', positions, FEATURE_COLUMNS, format, offset, limit, version)
     
 @router.get('/ml/training-data', tags=['ML READY'], summary='Fornece um conjunto de dados de treinamento (features + label).')
-async def get_training_data():
+async def get_training_data(
+    request: Request,
+    split: Literal['train', 'validation', 'all'] = Query('train', description='Conjunto exportado'),
+    format: ExportFormat = Query('json', description='json, ndjson, csv ou arrow (Arrow IPC)'),
+    offset: int = Query(0, ge=0, description='Posição da primeira linha'),
+    limit: int | None = Query(None, ge=1, description='Quantidade máxima de linhas'),
+    version: str | None = Query(None, description='Versão do dataset esperada (X-Dataset-Version)'),
+):
     """
-    Retorna uma amostra de 80% dos dados, contendo as features (`availability`, `rating`)
-    e o label (`price`), pronto para ser usado no treinamento de um modelo
-    de regressão para prever o preço.
+    Retorna os dados de treino (80%) ou de validação (20%), contendo as
+    features (`availability`, `rating`) e o label (`price`), pronto para ser
+    usado no treinamento de um modelo de regressão para prever o preço.
+
+    A divisão e a ordem das linhas são sempre as mesmas para uma versão do
+    dataset, então o download pode ser feito em partes com `offset`/`limit`
+    (passando `version` para garantir que nada mudou entre as partes).
     """
-    try: 
-        training_data = pd.DataFrame()
-        training_data[['x1_availability','x2_rating','y_labels_price']] = books[['availability','rating','price']].sample(frac=0.8)
-        return training_data.to_dict(orient='records')
-    
-    except Exception as e:
-        raise HTTPException(status_code=404, detail='coleção não encontradas')
+    store = catalog.current()
+    positions = store.training_split.splits[split]
+    return export_rows(request, store, f'training-{split}', positions, TRAINING_COLUMNS, format, offset, limit, version)
 
 
 @router.post('/ml/predictions', tags=['ML READY'], summary='Prevê o preço de um livro com base em suas features.')
 async def receive_predictions(input: PredictionInput):
     """
     Recebe a disponibilidade (`availability`) e a avaliação (`rating`) de um livro
-    e utiliza um modelo de Machine Learning (simulado) para prever seu preço.
+    e utiliza um modelo de Machine Learning para prever seu preço.
     """
     try: 
-        return fake_model(input)
+        prediction = await prediction_batcher.predict([input.feature1, input.feature2])
+        return f'predição para as features dadas: {prediction}'
     except Exception as e:
         raise HTTPException(status_code=404, detail='features inválidas')
 
+
+@router.post('/ml/predictions/batch', tags=['ML READY'], summary='Prevê o preço de vários livros numa única requisição.')
+async def receive_batch_predictions(request: Request):
+    """
+    Recebe um array JSON de linhas de features, ou NDJSON (uma linha por linha,
+    com `Content-Type: application/x-ndjson`), e retorna um array com a
+    predição de cada linha, na mesma ordem.
+
+    Cada linha pode ser um objeto `{"feature1": ..., "feature2": ...}` ou uma
+    lista `[feature1, feature2]`.
+    """
+    body = await request.body()
+    try:
+        if 'ndjson' in request.headers.get('content-type', ''):
+            rows = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            rows = json.loads(body)
+        if not isinstance(rows, list):
+            raise ValueError('o corpo deve ser um array de linhas')
+        model = prediction_model()
+        X = feature_matrix(rows, model.features)
+    except (ValueError, TypeError, KeyError) as e:
+        raise HTTPException(status_code=400, detail='features inválidas')
+
+    predictions = model.predict(X)
+    return Response(json.dumps(predictions.tolist()), media_type='application/json')
+
+@router.get('/metrics', tags=['MONITORAMENTO'], summary='Métricas das requisições no formato do Prometheus.')
+async def get_metrics():
+    """
+    Histogramas de duração (por método, rota e status), de tamanho das
+    respostas e das etapas internas (consulta, serialização, gravação dos
+    logs), acumulados desde que o serviço subiu e somados entre os workers, e
+    o estado da fila de gravação dos logs (na fila, gravados, descartados e com falha).
+    """
+    text = await asyncio.to_thread(metrics_registry.prometheus)
+    return Response(text, media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@router.get('/metrics/summary', tags=['MONITORAMENTO'], summary='Resumo das métricas por rota.')
+async def get_metrics_summary():
+    """
+    Uma linha por rota, ordenada pelo tempo total consumido: requisições,
+    erros, média e percentis de latência, bytes médios e tempo médio das etapas,
+    somando todos os workers.
+    """
+    return await asyncio.to_thread(metrics_registry.summary)
+
+
 app.include_router(router)
@@ -1,54 +1,215 @@
 from fastapi import HTTPException, Depends
-from jose import JWTError, jwt
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+import asyncio
+import ipaddress
 import os
 import json
+import sqlite3
+import threading
+import time
 
-load_dotenv()
-
+# o .env é carregado uma única vez, no início do api.py
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Contexto de hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # schema do token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
-# Carrega registros de usuarios
-with open("users.json", "r") as f:
-    fake_users_db = json.load(f)
+
+# Contexto de hashing (o passlib e o bcrypt só são importados no primeiro login)
+@cache
+def pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+# Carrega registros de usuarios (no primeiro login)
+@cache
+def users_db() -> dict:
+    with open("users.json", "r") as f:
+        return json.load(f)
+
+
+# Pool pequeno e dedicado para o bcrypt: uma rajada de logins ocupa no máximo
+# AUTH_WORKERS núcleos e não bloqueia o event loop nem o pool padrão do FastAPI
+AUTH_WORKERS = int(os.getenv("AUTH_WORKERS", 2))
+auth_executor = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="auth")
+
+# Tentativas de login permitidas por usuário e por IP dentro da janela (segundos)
+LOGIN_MAX_ATTEMPTS = int(os.getenv("LOGIN_MAX_ATTEMPTS", 10))
+LOGIN_WINDOW = float(os.getenv("LOGIN_WINDOW", 60))
+# Arquivo com as tentativas, compartilhado pelos workers
+LOGIN_THROTTLE_PATH = os.getenv("LOGIN_THROTTLE_PATH", ".login_throttle.sqlite")
+
+# Quantidade de tokens já verificados mantidos em memória
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 1024))
+
+
+class TokenCache:
+    '''LRU de tokens já verificados (token -> usuário), cada um válido até o seu exp.'''
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            username, exp = entry
+            if exp <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return username
+
+    def put(self, token: str, username: str, exp: float):
+        with self._lock:
+            self._entries[token] = (username, exp)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class LoginThrottle:
+    '''
+    Janela deslizante de tentativas de login por chave (usuário, IP).
+
+    As tentativas ficam num arquivo SQLite (LOGIN_THROTTLE_PATH) compartilhado
+    pelos workers do gunicorn, então o limite vale para o serviço todo, e não
+    para cada processo. Cada thread usa a sua conexão, e as verificações de
+    um login acontecem numa única transação (BEGIN IMMEDIATE). Se o arquivo
+    não puder ser usado, o erro é impresso e a tentativa é permitida.
+    '''
+
+    def __init__(self, path: str = LOGIN_THROTTLE_PATH, max_attempts: int = LOGIN_MAX_ATTEMPTS,
+                 window: float = LOGIN_WINDOW):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.window = window
+        self._local = threading.local()
+        self._last_sweep = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        # conexões não passam de um processo para outro (fork do gunicorn)
+        if getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS login_attempts (key TEXT NOT NULL, ts REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_login_attempts_key_ts ON login_attempts (key, ts)")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return self._local.conn
+
+    def hit(self, *keys: str) -> float:
+        '''Registra uma tentativa; retorna 0 se permitida ou os segundos até poder tentar de novo.'''
+        now = time.time()
+        cutoff = now - self.window
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                retry_after = 0.0
+                for key in keys:
+                    count, oldest = conn.execute(
+                        "SELECT COUNT(*), MIN(ts) FROM login_attempts WHERE key = ? AND ts > ?", (key, cutoff)
+                    ).fetchone()
+                    if count >= self.max_attempts:
+                        retry_after = max(retry_after, oldest + self.window - now)
+                if not retry_after:
+                    conn.executemany("INSERT INTO login_attempts (key, ts) VALUES (?, ?)", [(key, now) for key in keys])
+                if now - self._last_sweep >= self.window:
+                    # apaga as tentativas que já saíram da janela
+                    self._last_sweep = now
+                    conn.execute("DELETE FROM login_attempts WHERE ts <= ?", (cutoff,))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return retry_after
+        except sqlite3.Error as e:
+            print(f"Erro ao registrar a tentativa de login: {e}")
+            return 0.0
+
+    def reset(self, key: str):
+        try:
+            self._connect().execute("DELETE FROM login_attempts WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            print(f"Erro ao limpar as tentativas de login: {e}")
+
+
+def throttle_ip(host: str | None, forwarded_for: str | None) -> str | None:
+    '''
+    IP usado no limite de logins. Um host público é o próprio cliente (ou o IP
+    que o uvicorn já tirou do X-Forwarded-For dos proxies de FORWARDED_ALLOW_IPS):
+    o cabeçalho, que o cliente pode forjar, é ignorado. Um host privado é um
+    proxy na frente do app (ex: o router do Heroku), que acrescenta ao final do
+    X-Forwarded-For o IP de quem se conectou a ele: vale só a última entrada, as
+    anteriores vêm do cliente. Sem um IP válido, retorna None e o limite fica
+    só por usuário.
+    '''
+    if host is None:
+        return None
+    try:
+        private = ipaddress.ip_address(host).is_private
+    except ValueError:
+        return host
+    if not forwarded_for or not private:
+        return host
+    client = forwarded_for.rsplit(',', 1)[-1].strip()
+    try:
+        return str(ipaddress.ip_address(client))
+    except ValueError:
+        return None
+
+
+token_cache = TokenCache()
+login_throttle = LoginThrottle()
 
 
 # Verifica senha
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context().verify(plain_password, hashed_password)
 
 # Autentica usuario
 def authenticate_user(username: str, password: str):
-    user = fake_users_db.get(username)
+    user = users_db().get(username)
     if not user or not verify_password(password, user['hashed_password']):
         return False
     return user
 
+# Autentica usuario sem bloquear o event loop (o bcrypt roda no auth_executor)
+async def authenticate_user_async(username: str, password: str):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(auth_executor, authenticate_user, username, password)
+
 # Cria o token JWT
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
+    from jose import jwt
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-# Pega usuário atual pelo token
+# Pega usuário atual pelo token (tokens já verificados vêm do token_cache)
 def get_current_user(token: str = Depends(oauth2_scheme)):
+    username = token_cache.get(token)
+    if username is not None:
+        return username
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(status_code=401, detail="Token inválido")
+        if "exp" in payload:
+            token_cache.put(token, username, float(payload["exp"]))
         return username
     except JWTError:
         raise HTTPException(status_code=401, detail="Token inválido")
\ No newline at end of file
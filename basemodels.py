@@ -1,25 +1,52 @@
+import time
 from pydantic import BaseModel, Field
 from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
-from db_utils import log_event 
+from db_utils import log_writer
+import metrics
 
 class LoggingMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
+        start = time.perf_counter()
+        stages = metrics.begin_request()
         try:
             response: Response = await call_next(request)
             status_code = response.status_code
         except Exception as e:
             # Handles unexpected exceptions or HTTPException in your routes
             status_code = 500
+            self.record(request, status_code, start, 0, stages)
             raise e  # Still raise the exception to return correct error
         finally:
-            # Log regardless of outcome
+            # Log regardless of outcome (sem bloquear: a gravação é feita em lote
+            # por uma thread em segundo plano)
             endpoint = request.url.path
-            log_event(endpoint, status_code)
+            log_writer.submit(endpoint, status_code)
 
+        # a duração e o tamanho só são conhecidos depois que o corpo inteiro foi enviado
+        body_iterator = response.body_iterator
+
+        async def measured_body():
+            size = 0
+            try:
+                async for chunk in body_iterator:
+                    size += len(chunk)
+                    yield chunk
+            finally:
+                self.record(request, status_code, start, size, stages)
+
+        response.body_iterator = measured_body()
         return response
 
+    @staticmethod
+    def record(request: Request, status_code: int, start: float, size: int, stages: dict):
+        # o template da rota (ex: /api/v1/books/{id}) mantém poucas séries por endpoint
+        route = request.scope.get('route')
+        route_path = getattr(route, 'path', None) or metrics.UNMATCHED_ROUTE
+        metrics.registry.observe_request(request.method, route_path, status_code,
+                                         time.perf_counter() - start, size, stages)
+
 
 class Book(BaseModel):
     id : str
@@ -31,6 +58,11 @@ class Book(BaseModel):
     image_links : str = Field(None, description='URL da imagem do livro')
 
 
+class BookPage(BaseModel):
+    items : list[Book]
+    next_cursor : str | None = Field(None, description='Cursor da próxima página (nulo na última)')
+
+
 class PredictionInput(BaseModel):
     feature1: float
     feature2: float
@@ -0,0 +1,72 @@
+'''
+Compara dois resultados do bench/run.py (por exemplo, antes e depois de um
+commit) e aponta as regressões de latência e de vazão.
+
+Uso: python bench/compare.py ANTES.json DEPOIS.json [--threshold 10]
+    sai com código 1 se alguma métrica piorou mais que threshold %
+'''
+
+import argparse
+import json
+import sys
+
+# métrica -> True se valores maiores são piores
+METRICS = {'p50_ms': True, 'p99_ms': True, 'rps': False, 'seconds': True, 'books_per_second': False}
+
+
+def load(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def flatten(results: dict) -> dict:
+    '''(suite, tamanho, endpoint) -> métricas'''
+    rows = {}
+    for run in results.get('api') or []:
+        for endpoint, metrics in run['endpoints'].items():
+            rows[('api', run['size'], endpoint)] = metrics
+        if 'load_seconds' in run:
+            rows[('api', run['size'], 'carga do catálogo')] = {'seconds': run['load_seconds']}
+    if results.get('scraper'):
+        rows[('scraper', results['scraper']['books'], 'run')] = results['scraper']
+    return rows
+
+
+def change(before: float, after: float) -> float | None:
+    if not before:
+        return None
+    return (after - before) / before * 100
+
+
+def compare(before: dict, after: dict, threshold: float) -> list[str]:
+    old, new = flatten(before), flatten(after)
+    regressions = []
+    print(f"{'suite':<8} {'tamanho':>9} {'endpoint':<20} {'métrica':<16} {'antes':>11} {'depois':>11} {'variação':>9}")
+    for key in sorted(old.keys() & new.keys(), key=lambda key: (key[0], key[1] or 0, key[2])):
+        suite, size, endpoint = key
+        for metric, higher_is_worse in METRICS.items():
+            if metric not in old[key] or metric not in new[key]:
+                continue
+            delta = change(old[key][metric], new[key][metric])
+            worse = delta is not None and (delta > threshold if higher_is_worse else delta < -threshold)
+            flag = '  <- regressão' if worse else ''
+            delta_text = '-' if delta is None else f'{delta:+.1f}%'
+            print(f'{suite:<8} {size or "-":>9} {endpoint:<20} {metric:<16} {old[key][metric]:>11} '
+                  f'{new[key][metric]:>11} {delta_text:>9}{flag}')
+            if worse:
+                regressions.append(f'{suite}/{size}/{endpoint} {metric} {delta_text}')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compara dois resultados do benchmark')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10, help='Variação (%%) considerada regressão')
+    args = parser.parse_args()
+
+    before, after = load(args.before), load(args.after)
+    print(f"antes: {before['meta'].get('commit')}  depois: {after['meta'].get('commit')}\n")
+    regressions = compare(before, after, args.threshold)
+    print(f'\n{len(regressions)} regressões acima de {args.threshold:g}%')
+    sys.exit(1 if regressions else 0)
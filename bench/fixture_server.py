@@ -0,0 +1,135 @@
+'''
+Servidor HTTP local com páginas no formato do 'books.toscrape.com', usado para
+rodar e medir o scraping sem acesso à internet.
+
+Serve um diretório com as páginas salvas do site (por exemplo com
+`wget --mirror https://books.toscrape.com/`). Com `--generate N` o diretório é
+antes preenchido com N livros sintéticos que seguem a mesma marcação HTML
+(home, categorias paginadas e páginas de detalhe).
+
+Uso:
+    python bench/fixture_server.py --dir fixtures/site --generate 1000 --port 8001
+    python scraping.py --base-url http://127.0.0.1:8001/
+'''
+
+import argparse
+import functools
+import hashlib
+import os
+import random
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'site')
+RATINGS = ['One', 'Two', 'Three', 'Four', 'Five']
+WORDS = ['light', 'shadow', 'river', 'night', 'garden', 'secret', 'city', 'winter', 'house',
+         'ocean', 'story', 'fire', 'glass', 'mountain', 'dream', 'king', 'stone', 'song']
+
+PAGE = '''<!DOCTYPE html>
+<html lang="en-us"><head><meta charset="utf-8"><title>{title} | Books to Scrape - Sandbox</title></head>
+<body><div class="container-fluid page"><div class="page_inner">{body}</div></div></body></html>
+'''
+
+HOME = '''<div class="row"><aside class="sidebar col-sm-4 col-md-3"><div class="side_categories">
+<ul class="nav nav-list"><li><a href="catalogue/category/books_1/index.html">Books</a><ul>
+{links}
+</ul></li></ul></div></aside></div>
+'''
+
+POD = '''<li class="col-xs-6 col-sm-4 col-md-3 col-lg-3"><article class="product_pod">
+<div class="image_container"><a href="../../../{slug}/index.html"><img src="../../../../media/cache/{image}" alt="{title}" class="thumbnail"></a></div>
+<p class="star-rating {rating}"><i class="icon-star"></i></p>
+<h3><a href="../../../{slug}/index.html" title="{title}">{title}</a></h3>
+<div class="product_price"><p class="price_color">£{price}</p><p class="instock availability"><i class="icon-ok"></i> In stock</p></div>
+</article></li>
+'''
+
+DETAIL = '''<div class="content"><div id="content_inner"><article class="product_page"><div class="row">
+<div class="col-sm-6"><div id="product_gallery" class="carousel"><div class="thumbnail"><div class="carousel-inner">
+<div class="item active"><img src="../../media/cache/{image}" alt="{title}" /></div></div></div></div></div>
+<div class="col-sm-6 product_main"><h1>{title}</h1>
+<p class="price_color">£{price}</p>
+<p class="instock availability"><i class="icon-ok"></i> In stock ({stock} available)</p>
+<p class="star-rating {rating}"><i class="icon-star"></i></p></div></div>
+<div class="sub-header"><h2>Product Information</h2></div>
+<table class="table table-striped">
+<tr><th>UPC</th><td>{upc}</td></tr><tr><th>Product Type</th><td>Books</td></tr>
+<tr><th>Price (excl. tax)</th><td>£{price}</td></tr><tr><th>Availability</th><td>In stock ({stock} available)</td></tr>
+</table></article></div></div>
+'''
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def generate(directory=DEFAULT_DIR, books=1000, categories=50, per_page=20, seed=0):
+    '''Gera um site sintético com `books` livros distribuídos em `categories` categorias.'''
+    rng = random.Random(seed)
+    category_slugs = [f'{rng.choice(WORDS)}-{i}_{i + 2}' for i in range(categories)]
+    per_category = {slug: [] for slug in category_slugs}
+
+    for i in range(books):
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title() + f' #{i}'
+        book = {
+            'slug': f'book-{i}_{i + 1}',
+            'title': title,
+            'upc': hashlib.md5(f'{seed}-{i}'.encode()).hexdigest()[:16],
+            'price': f'{rng.uniform(10, 60):.2f}',
+            'rating': rng.choice(RATINGS),
+            'stock': rng.randint(0, 22),
+            'image': f'{i % 97:02x}/{i:04x}/{hashlib.md5(title.encode()).hexdigest()}.jpg',
+        }
+        per_category[category_slugs[i % categories]].append(book)
+        write(os.path.join(directory, 'catalogue', book['slug'], 'index.html'),
+              PAGE.format(title=title, body=DETAIL.format(**book)))
+
+    links = '\n'.join(f'<li><a href="catalogue/category/books/{slug}/index.html">{slug}</a></li>'
+                      for slug in category_slugs)
+    write(os.path.join(directory, 'index.html'), PAGE.format(title='All products', body=HOME.format(links=links)))
+
+    for slug, items in per_category.items():
+        pages = [items[i:i + per_page] for i in range(0, len(items), per_page)] or [[]]
+        for number, page_items in enumerate(pages, start=1):
+            pager = f'<li class="current">Page {number} of {len(pages)}</li>'
+            if number < len(pages):
+                pager += f'<li class="next"><a href="page-{number + 1}.html">next</a></li>'
+            body = '<ol class="row">' + ''.join(POD.format(**book) for book in page_items) + '</ol>' \
+                   + f'<div><ul class="pager">{pager}</ul></div>'
+            name = 'index.html' if number == 1 else f'page-{number}.html'
+            write(os.path.join(directory, 'catalogue', 'category', 'books', slug, name),
+                  PAGE.format(title=slug, body=body))
+    return directory
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(directory=DEFAULT_DIR, host='127.0.0.1', port=0):
+    '''Inicia o servidor numa thread; retorna (servidor, base_url). Encerre com server.shutdown().'''
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fixture-server', daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}/'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Servidor local de páginas do books.toscrape.com')
+    parser.add_argument('--dir', default=DEFAULT_DIR, help='Diretório com as páginas salvas')
+    parser.add_argument('--generate', type=int, metavar='N', help='Gera N livros sintéticos antes de servir')
+    parser.add_argument('--port', type=int, default=8001)
+    args = parser.parse_args()
+
+    if args.generate:
+        generate(args.dir, books=args.generate)
+    server, base_url = serve(args.dir, port=args.port)
+    print(f'Servindo {args.dir} em {base_url}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
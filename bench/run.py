@@ -0,0 +1,267 @@
+'''
+Benchmark da API e do scraping, sem acesso à internet.
+
+API: para cada tamanho de catálogo (1k, 100k e 1M livros sintéticos no schema
+do books.csv) o dataset é publicado num diretório temporário, a API é
+importada no próprio processo (com DATABASE_URL apontando para um SQLite
+temporário) e cada endpoint recebe requisições concorrentes por um cliente
+httpx ligado direto ao app ASGI. Com `--url` os endpoints são medidos num
+servidor já rodando (uvicorn/gunicorn), com o dataset que ele estiver servindo.
+
+Scraping: o scraping.run() completo contra o servidor local de páginas
+(bench/fixture_server.py).
+
+O resultado (latência p50/p90/p99, requisições por segundo, bytes) é gravado em
+JSON, para comparar entre commits com bench/compare.py.
+
+Uso:
+    python bench/run.py --output bench/results/atual.json
+    python bench/run.py --sizes 1000,100000 --skip-scraper
+    python bench/compare.py bench/results/antes.json bench/results/atual.json
+'''
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import storage  # noqa: E402
+from bench.fixture_server import generate, serve  # noqa: E402
+
+SIZES = (1_000, 100_000, 1_000_000)
+WORDS = ['light', 'shadow', 'river', 'night', 'garden', 'secret', 'city', 'winter', 'house',
+         'ocean', 'story', 'fire', 'glass', 'mountain', 'dream', 'king', 'stone', 'song']
+
+# nome -> (método, caminho); {id} é trocado por um id sorteado do catálogo
+ENDPOINTS = {
+    'books': ('GET', '/api/v1/books'),
+    'books_page': ('GET', '/api/v1/books?limit=100'),
+    'books_ndjson_page': ('GET', '/api/v1/books?limit=1000&format=ndjson'),
+    'book_by_id': ('GET', '/api/v1/books/{id}'),
+    'search': ('GET', '/api/v1/books/search?title=river%20garden'),
+    'search_prefix': ('GET', '/api/v1/books/search?title=moun'),
+    'search_typo': ('GET', '/api/v1/books/search?title=secrte'),
+    'categories': ('GET', '/api/v1/categories'),
+    'top_rated': ('GET', '/api/v1/books/top-rated'),
+    'price_range': ('GET', '/api/v1/books/price-range?min=20&max=20.5'),
+    'stats_overview': ('GET', '/api/v1/stats/overview'),
+    'stats_categories': ('GET', '/api/v1/stats/categories'),
+    'health': ('GET', '/api/v1/health'),
+    'ml_features_page': ('GET', '/api/v1/ml/features?format=ndjson&limit=1000'),
+    'ml_predictions': ('POST', '/api/v1/ml/predictions'),
+}
+
+
+def synthetic_catalog(n: int, categories: int = 50, seed: int = 0) -> pd.DataFrame:
+    '''Catálogo com n livros no schema do books.csv.'''
+    rng = np.random.default_rng(seed)
+    words = rng.choice(WORDS, (n, 3)).tolist()
+    return pd.DataFrame({
+        'id': [f'{i:016x}' for i in range(n)],
+        'title': [f'{a} {b} {c} {i}'.title() for i, (a, b, c) in enumerate(words)],
+        'category': rng.choice([f'{WORDS[i % len(WORDS)]}-{i}' for i in range(categories)], n),
+        'price': rng.uniform(10, 60, n).round(2),
+        'rating': rng.integers(1, 6, n),
+        'availability': rng.integers(0, 23, n),
+        'image_links': [f'https://books.toscrape.com/media/cache/{i:08x}.jpg' for i in range(n)],
+    })
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int, size: int) -> dict:
+    values = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p90_ms': round(float(np.percentile(values, 90)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'mean_ms': round(float(values.mean()), 3),
+        'rps': round(len(latencies) / elapsed, 1),
+        'bytes': size,
+    }
+
+
+async def measure(client, method: str, path: str, ids: list[str], requests: int,
+                  concurrency: int, max_seconds: float) -> dict:
+    '''Dispara até `requests` requisições (ou até max_seconds) com `concurrency` em paralelo.'''
+    latencies, errors, size = [], 0, 0
+    deadline = time.perf_counter() + max_seconds
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors, size
+        while remaining > 0 and time.perf_counter() < deadline:
+            remaining -= 1
+            url = path.replace('{id}', random.choice(ids))
+            start = time.perf_counter()
+            if method == 'POST':
+                response = await client.post(url, json={'feature1': random.randint(0, 22), 'feature2': random.randint(1, 5)})
+            else:
+                response = await client.get(url)
+            latencies.append(time.perf_counter() - start)
+            size = len(response.content)
+            errors += response.status_code >= 400
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(latencies, time.perf_counter() - start, errors, size)
+
+
+async def bench_endpoints(client, ids, args) -> dict:
+    results = {}
+    for name, (method, path) in ENDPOINTS.items():
+        if args.endpoints and name not in args.endpoints:
+            continue
+        await measure(client, method, path, ids, args.warmup, 1, args.max_seconds)  # aquecimento
+        results[name] = await measure(client, method, path, ids, args.requests, args.concurrency, args.max_seconds)
+        print(f"  {name:<20} p50 {results[name]['p50_ms']:>9.2f} ms  p99 {results[name]['p99_ms']:>9.2f} ms  "
+              f"{results[name]['rps']:>8.1f} req/s")
+    return results
+
+
+def prepare_environment(workdir: str) -> str:
+    '''Variáveis lidas pela API no import: dataset e banco de logs temporários.'''
+    data_dir = os.path.join(workdir, 'data')
+    db_path = os.path.join(workdir, 'logs.db')  # as tabelas são criadas pelo LogWriter
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['BOOKS_DATA_DIR'] = data_dir
+    os.environ['CATALOG_POLL_INTERVAL'] = '3600'
+    os.environ.setdefault('SECRET_KEY', 'bench')
+    return data_dir
+
+
+async def bench_api_inprocess(args, workdir: str) -> list[dict]:
+    import httpx
+
+    data_dir = prepare_environment(workdir)
+    results = []
+    api = None
+    for n in args.sizes:
+        print(f'API com {n} livros')
+        df = synthetic_catalog(n)
+        storage.write_dataset(df, data_dir)
+        ids = df['id'].sample(min(n, 1000), random_state=0).tolist()
+        del df
+
+        start = time.perf_counter()
+        if api is None:
+            os.chdir(ROOT)  # users.json e model.json são lidos do diretório atual
+            import api
+        api.preload()  # o ASGITransport não roda o lifespan
+        load_seconds = time.perf_counter() - start
+        print(f'  carga do catálogo: {load_seconds:.2f} s')
+
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+            endpoints = await bench_endpoints(client, ids, args)
+        results.append({'size': n, 'load_seconds': round(load_seconds, 3), 'endpoints': endpoints})
+
+    if api is not None:
+        from db_utils import log_writer
+        log_writer.stop()  # grava os logs pendentes antes de o diretório temporário ser removido
+    return results
+
+
+async def bench_api_remote(args) -> list[dict]:
+    import httpx
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+        response = await client.get('/api/v1/books?limit=1000&fields=id')
+        ids = [book['id'] for book in response.json()['items']]
+        print(f'API em {args.url}')
+        endpoints = await bench_endpoints(client, ids, args)
+    return [{'size': None, 'url': args.url, 'endpoints': endpoints}]
+
+
+def bench_scraper(args, workdir: str) -> dict:
+    '''Tempo do scraping.run() completo contra o servidor local de páginas.'''
+    import scraping
+
+    site = generate(os.path.join(workdir, 'site'), books=args.scraper_books)
+    server, base_url = serve(site)
+    cwd = os.getcwd()
+    os.chdir(workdir)  # o scraping grava books.csv no diretório atual
+    os.environ['BOOKS_DATA_DIR'] = os.path.join(workdir, 'scraper-data')
+    try:
+        duration = scraping.run(base_url=base_url, incremental=False, cache_path=os.path.join(workdir, 'cache.db'))
+        books = len(pd.read_csv('books.csv'))
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+    return {
+        'books': books,
+        'seconds': round(duration, 3),
+        'books_per_second': round(books / duration, 1),
+        'concurrency': scraping.CONCURRENCY,
+    }
+
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da API e do scraping')
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)),
+                        help='Tamanhos dos catálogos sintéticos, separados por vírgula')
+    parser.add_argument('--requests', type=int, default=200, help='Requisições por endpoint')
+    parser.add_argument('--warmup', type=int, default=5, help='Requisições de aquecimento por endpoint')
+    parser.add_argument('--concurrency', type=int, default=8, help='Requisições simultâneas')
+    parser.add_argument('--max-seconds', type=float, default=10, help='Tempo máximo por endpoint')
+    parser.add_argument('--endpoints', help='Só estes endpoints (separados por vírgula)')
+    parser.add_argument('--url', help='Mede um servidor já rodando em vez da API no processo')
+    parser.add_argument('--scraper-books', type=int, default=1000, help='Livros do site local do scraping')
+    parser.add_argument('--skip-api', action='store_true')
+    parser.add_argument('--skip-scraper', action='store_true')
+    parser.add_argument('--output', help='Arquivo JSON com os resultados (padrão: stdout)')
+    args = parser.parse_args()
+    args.sizes = [int(size) for size in args.sizes.split(',') if size]
+    args.endpoints = args.endpoints.split(',') if args.endpoints else None
+
+    results = {'meta': metadata(), 'api': [], 'scraper': None}
+    with tempfile.TemporaryDirectory(prefix='bench-') as workdir:
+        if not args.skip_api:
+            if args.url:
+                results['api'] = asyncio.run(bench_api_remote(args))
+            else:
+                results['api'] = asyncio.run(bench_api_inprocess(args, workdir))
+        if not args.skip_scraper:
+            results['scraper'] = bench_scraper(args, workdir)
+            print(f"scraping: {results['scraper']['books']} livros em {results['scraper']['seconds']} s")
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        print(f'resultados gravados em {args.output}')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+'''
+Mede o custo de inicialização da API:
+
+    -import: `python -X importtime -c "import api"`, com o tempo total e os
+     módulos importados diretamente pelo api.py, do mais caro para o mais barato
+    -primeira requisição: tempo desde o início do processo do servidor até a
+     primeira resposta 200 do /api/v1/health (import + lifespan com a carga do
+     dataset + primeira requisição)
+
+Cada medida é repetida `--runs` vezes e vale a mediana. Sai com código 1 se o
+tempo até a primeira requisição passar de `--target` segundos.
+
+Uso:
+    python bench/startup.py
+    python bench/startup.py --target 1.2 --runs 5 --output bench/results/startup.json
+    python bench/startup.py --command "gunicorn api:app -c gunicorn.conf.py"
+'''
+
+import argparse
+import json
+import os
+import re
+import shlex
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.run import metadata  # noqa: E402
+
+# meta de tempo até a primeira requisição, em segundos
+TARGET = float(os.getenv('STARTUP_TARGET', 1.5))
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_env(workdir: str) -> dict:
+    env = dict(os.environ)
+    # sem banco configurado, os logs vão para um SQLite temporário
+    env.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(workdir, 'logs.db')}")
+    env.setdefault('SECRET_KEY', 'startup')
+    return env
+
+
+def import_times(module: str, env: dict) -> dict:
+    '''Tempo total do import e dos módulos importados diretamente por ele (ms).'''
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    children, total, self_time = {}, None, None
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        own, cumulative, indent, name = int(match[1]), int(match[2]), len(match[3]), match[4]
+        if indent == 1 and name == module:
+            total, self_time = cumulative / 1000, own / 1000
+            break
+        if indent == 1:  # módulo de nível superior importado antes (ex: pelo site.py)
+            children = {}
+        elif indent == 3:
+            children[name] = cumulative / 1000
+    return {'total_ms': total, 'self_ms': self_time, 'modules_ms': children}
+
+
+def time_to_first_request(command: list[str], port: int, env: dict, timeout: float) -> float:
+    '''Segundos desde o início do servidor até a primeira resposta 200.'''
+    import httpx
+
+    url = f'http://127.0.0.1:{port}/api/v1/health'
+    # um único cliente: criar um por tentativa disputaria a CPU com o servidor
+    client = httpx.Client(timeout=timeout)
+    start = time.perf_counter()
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f'o servidor terminou com código {server.returncode}')
+            try:
+                if client.get(url).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.TransportError:
+                pass
+            time.sleep(0.01)
+        raise TimeoutError(f'sem resposta de {url} em {timeout} s')
+    finally:
+        client.close()
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tempo de inicialização da API')
+    parser.add_argument('--command', default='uvicorn api:app --port {port}',
+                        help='Comando do servidor ({port} é trocado por uma porta livre)')
+    parser.add_argument('--runs', type=int, default=3, help='Repetições de cada medida')
+    parser.add_argument('--target', type=float, default=TARGET, help='Meta de tempo até a primeira requisição (s)')
+    parser.add_argument('--timeout', type=float, default=60, help='Tempo máximo de espera pelo servidor (s)')
+    parser.add_argument('--output', help='Arquivo JSON com os resultados')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='startup-') as workdir:
+        env = server_env(workdir)
+        imports = [import_times('api', env) for _ in range(args.runs)]
+        first_request = []
+        for _ in range(args.runs):
+            port = free_port()
+            command = shlex.split(args.command.replace('{port}', str(port)))
+            if '{port}' not in args.command:
+                env['PORT'] = str(port)  # gunicorn.conf.py lê a porta do PORT
+            first_request.append(time_to_first_request(command, port, env, args.timeout))
+
+    median = lambda values: round(statistics.median(values), 1)
+    modules = {name: median([run['modules_ms'].get(name, 0) for run in imports])
+               for name in imports[0]['modules_ms']}
+    results = {
+        'meta': metadata(),
+        'import_ms': median([run['total_ms'] for run in imports]),
+        'import_self_ms': median([run['self_ms'] for run in imports]),
+        'import_modules_ms': dict(sorted(modules.items(), key=lambda item: item[1], reverse=True)),
+        'first_request_seconds': round(statistics.median(first_request), 3),
+        'target_seconds': args.target,
+    }
+
+    print(f"import api: {results['import_ms']:.1f} ms (no próprio api.py: {results['import_self_ms']:.1f} ms)")
+    for name, ms in results['import_modules_ms'].items():
+        print(f'  {name:<24} {ms:>9.1f} ms')
+    print(f"primeira requisição: {results['first_request_seconds']:.3f} s (meta: {args.target:g} s)")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(results, indent=2, ensure_ascii=False) + '\n')
+        print(f'resultados gravados em {args.output}')
+    sys.exit(1 if results['first_request_seconds'] > args.target else 0)
+
+
+if __name__ == '__main__':
+    main()
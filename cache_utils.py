@@ -0,0 +1,64 @@
+'''
+Esse módulo guarda respostas JSON já serializadas para os endpoints que
+devolvem a coleção inteira (ou agregados dela).
+
+O corpo é codificado uma única vez por versão do dataset e servido como bytes,
+junto com um ETag forte. Requisições com `If-None-Match` correspondente
+recebem 304 sem corpo.
+'''
+
+import hashlib
+import threading
+from typing import Any, Callable
+
+from fastapi import Request
+from starlette.responses import Response
+
+from records import dumps
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    '''Comparação fraca do If-None-Match (RFC 9110), aceita lista e `*`.'''
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    return etag in candidates
+
+
+class ResponseCache:
+    def __init__(self):
+        self._entries = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def invalidate(self, version: str):
+        '''Passa a guardar respostas da nova versão do dataset e descarta as anteriores.'''
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+
+    def get(self, key: str, version: str, build: Callable[[], Any]) -> tuple[bytes, str]:
+        '''Retorna (corpo, etag) da chave, serializando só quando a versão muda.'''
+        with self._lock:
+            if self._version is None:
+                self._version = version
+            # requisições que ainda usam um snapshot antigo não são guardadas
+            entry = self._entries.get(key) if version == self._version else None
+
+        if entry is None:
+            body = dumps(build())
+            entry = (body, '"' + hashlib.sha1(body).hexdigest() + '"')
+            with self._lock:
+                if version == self._version:
+                    self._entries[key] = entry
+        return entry
+
+    def respond(self, request: Request, key: str, version: str, build: Callable[[], Any]) -> Response:
+        body, etag = self.get(key, version, build)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type='application/json', headers=headers)
@@ -0,0 +1,338 @@
+'''
+Esse módulo mantém o catálogo de livros em memória, já indexado para as
+consultas feitas pela API:
+
+    -índice hash por id
+    -índice de busca textual por título (ver search.py)
+    -lista de preços ordenada, consultada com bisect
+    -postings (posições dos livros) por categoria
+    -ordenação dos mais bem avaliados, geral e por categoria
+    -divisão treino/validação para exportação dos dados de ML (ver training.py)
+
+Os livros ficam em BookRecords (ver records.py), com __slots__, em vez de um
+dicionário por linha.
+
+Os índices são construídos uma única vez a partir do dataset (formato colunar
+de storage.py ou, na falta dele, o books.csv), de forma que
+cada requisição faça apenas buscas O(1) ou O(log n) em vez de varrer o DataFrame.
+
+Cada CatalogStore é um snapshot imutável de uma versão do dataset. O
+CatalogHolder guarda a referência para o snapshot atual e a troca de forma
+atômica quando o dataset muda: requisições em andamento terminam no snapshot
+antigo, e os índices do novo são montados fora do caminho das requisições.
+'''
+
+import base64
+import binascii
+import bisect
+import hashlib
+import os
+import threading
+from typing import Callable
+import pandas as pd
+import records
+import storage
+from records import BookRecord
+from stats import CatalogStats
+from search import SearchIndex
+from training import TrainingSplit
+
+
+# fração máxima de livros alterados para atualizar as estruturas derivadas de forma incremental
+MAX_INCREMENTAL_CHANGES = 0.25
+
+
+def encode_cursor(book_id: str, position: int) -> str:
+    '''
+    Cursor opaco de paginação: a posição e o id do último livro entregue. A
+    posição desambigua ids repetidos (o books.csv não é deduplicado); o id
+    permite continuar de onde parou se o dataset mudar entre as páginas.
+    '''
+    raw = f'{position}:{book_id}'
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple[int | None, str]:
+    '''(posição, id) do cursor; a posição é None em cursores que só têm o id.'''
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(cursor + padding).decode('utf-8')
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError('cursor inválido')
+    position, separator, book_id = raw.partition(':')
+    if separator and position.isdigit():
+        return int(position), book_id
+    return None, raw
+
+
+def descending(value) -> tuple:
+    '''Chave de ordenação decrescente que deixa valores ausentes (NaN) no fim.'''
+    if isinstance(value, (int, float)) and value == value:
+        return (0, -value)
+    return (1, 0)
+
+
+def top_rated_key(record: BookRecord) -> tuple:
+    return descending(record.rating) + descending(record.price) + descending(record.availability)
+
+
+def normalize(text) -> str | None:
+    '''Normaliza textos para comparação (sem espaços nas pontas e minúsculo).'''
+    if not isinstance(text, str):
+        return None
+    return text.strip().lower()
+
+
+class CatalogStore:
+    def __init__(self, frame: pd.DataFrame, version: str | None = None):
+        self.frame = frame
+        # identifica a versão do dataset (usada para invalidar caches derivados)
+        self.version = version or hashlib.sha1(
+            pd.util.hash_pandas_object(frame, index=False).values.tobytes()
+        ).hexdigest()[:16]
+        self.records = records.from_frame(frame)
+
+        self.by_id = {}
+        self.by_category = {}
+        self.categories = []
+        prices = []
+
+        for pos, record in enumerate(self.records):
+            # mantém sempre a primeira ocorrência, como no filtro do pandas
+            self.by_id.setdefault(record.id, pos)
+
+            category = normalize(record.category)
+            if category is not None:
+                if category not in self.by_category:
+                    self.categories.append(record.category)
+                self.by_category.setdefault(category, []).append(pos)
+
+            price = record.price
+            if price == price:  # ignora NaN
+                prices.append((price, pos))
+
+        prices.sort()
+        self.sorted_prices = [price for price, _ in prices]
+        self.price_positions = [pos for _, pos in prices]
+
+    @classmethod
+    def from_csv(cls, path: str = 'books.csv') -> 'CatalogStore':
+        with open(path, 'rb') as f:
+            version = hashlib.sha1(f.read()).hexdigest()[:16]
+        # mesmos tipos do formato colunar (ex: preço como float, categoria categórica)
+        return cls(storage.coerce_schema(pd.read_csv(path)), version)
+
+    @classmethod
+    def from_storage(cls, root: str = storage.STORAGE_ROOT) -> 'CatalogStore':
+        frame, version = storage.load_dataset(root)
+        return cls(frame, version)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def build_derived(self, previous: 'CatalogStore | None' = None):
+        '''
+        Monta as estruturas derivadas (estatísticas, índice de busca, ordenação
+        dos mais bem avaliados e divisão treino/validação) desta versão. Quando há uma versão anterior, aproveita o que
+        ela já calculou e aplica só as diferenças.
+        '''
+        changes = diff(previous, self) if previous is not None else None
+        if changes is None:
+            self.stats = CatalogStats(self.records)
+            self.search_index = SearchIndex(self.records)
+        else:
+            self.stats = previous.stats.updated(*changes)
+            self.search_index = previous.search_index.updated(*changes)
+
+        # ordenação completa materializada uma vez: cada consulta só fatia os k primeiros
+        self.top_rated_positions = sorted(range(len(self.records)), key=lambda pos: top_rated_key(self.records[pos]))
+        self.top_rated_by_category = {}
+        for pos in self.top_rated_positions:
+            category = normalize(self.records[pos].category)
+            if category is not None:
+                self.top_rated_by_category.setdefault(category, []).append(pos)
+
+        self.training_split = TrainingSplit(self.frame)
+
+    @property
+    def columns(self) -> list[str]:
+        return list(records.FIELDS)
+
+    def position_after(self, cursor: str | None) -> int:
+        '''Posição do primeiro livro depois do cursor (0 quando não há cursor).'''
+        if cursor is None:
+            return 0
+        pos, book_id = decode_cursor(cursor)
+        if pos is not None and pos < len(self.records) and self.records[pos].id == book_id:
+            return pos + 1
+        # cursor de outra versão do dataset: continua depois do livro com o mesmo id
+        pos = self.by_id.get(book_id)
+        if pos is None:
+            raise ValueError('cursor inválido')
+        return pos + 1
+
+    def iter_records(self, start: int = 0, stop: int | None = None, fields: list[str] | None = None):
+        '''Itera os livros de forma preguiçosa, opcionalmente só com alguns campos.'''
+        stop = len(self.records) if stop is None else min(stop, len(self.records))
+        for pos in range(start, stop):
+            record = self.records[pos]
+            yield record if fields is None else records.project(record, fields)
+
+    def get(self, book_id: str) -> BookRecord | None:
+        pos = self.by_id.get(book_id)
+        return None if pos is None else self.records[pos]
+
+    def search_titles(self, query: str, category: str | None = None, limit: int = 10) -> list[BookRecord]:
+        return [self.get(book_id) for book_id in self.search_index.search(query, category, limit)]
+
+    def in_category(self, category: str, limit: int | None = None) -> list[BookRecord]:
+        positions = self.by_category.get(normalize(category), [])
+        return [self.records[pos] for pos in positions[:limit]]
+
+    def top_rated(self, k: int, category: str | None = None) -> list[BookRecord] | None:
+        '''Os k livros mais bem avaliados (rating, preço, estoque); None se a categoria não existe.'''
+        if category is None:
+            positions = self.top_rated_positions
+        else:
+            positions = self.top_rated_by_category.get(normalize(category))
+            if positions is None:
+                return None
+        return [self.records[pos] for pos in positions[:k]]
+
+    def price_range(self, min_price: float, max_price: float) -> list[BookRecord]:
+        start = bisect.bisect_left(self.sorted_prices, min_price)
+        end = bisect.bisect_right(self.sorted_prices, max_price)
+        # devolve na ordem original do catálogo
+        positions = sorted(self.price_positions[start:end])
+        return [self.records[pos] for pos in positions]
+
+
+def diff(old: CatalogStore, new: CatalogStore) -> tuple[list[BookRecord], list[BookRecord]] | None:
+    '''
+    Livros removidos e adicionados entre duas versões (um livro alterado aparece
+    nas duas listas). Retorna None se os ids não forem únicos ou se mudou tanta
+    coisa que recalcular as estruturas derivadas do zero sai mais barato.
+    '''
+    if len(old.by_id) != len(old.records) or len(new.by_id) != len(new.records):
+        return None
+    removed = [record for record in old.records if new.get(record.id) != record]
+    added = [record for record in new.records if old.get(record.id) != record]
+    if len(removed) + len(added) > len(new.records) * MAX_INCREMENTAL_CHANGES:
+        return None
+    return removed, added
+
+
+class CatalogHolder:
+    def __init__(self, csv_path: str = 'books.csv', storage_root: str = storage.STORAGE_ROOT,
+                 poll_interval: float = 5.0):
+        self.csv_path = csv_path
+        self.storage_root = storage_root
+        self.poll_interval = poll_interval
+        self._store = None
+        self._stamp = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def current(self) -> CatalogStore:
+        '''Snapshot atual; cada requisição deve pegá-lo uma única vez e usá-lo até o fim.'''
+        return self._store
+
+    def on_swap(self, callback: Callable[[CatalogStore], None]):
+        '''Registra uma função chamada (fora das requisições) a cada nova versão publicada.'''
+        self._listeners.append(callback)
+
+    def source(self) -> tuple[str, str]:
+        '''De onde carregar: o formato colunar, se existir, ou o books.csv.'''
+        if storage.has_dataset(self.storage_root):
+            return 'storage', storage.current_path(self.storage_root)
+        return 'csv', self.csv_path
+
+    def convert_csv(self) -> tuple[str, str]:
+        '''
+        Converte o books.csv para o formato colunar, para que as próximas cargas
+        (e os workers) usem o dataset mapeado em memória. Se não for possível
+        gravar (ex: sistema de arquivos somente leitura), continua no CSV.
+        '''
+        try:
+            storage.write_dataset(pd.read_csv(self.csv_path), self.storage_root)
+        except (OSError, ValueError) as e:
+            print(f"Erro ao converter {self.csv_path} para o formato colunar: {e}")
+        return self.source()
+
+    def load(self, kind: str) -> CatalogStore:
+        if kind == 'storage':
+            return CatalogStore.from_storage(self.storage_root)
+        return CatalogStore.from_csv(self.csv_path)
+
+    def stamp(self, kind: str, path: str) -> tuple | None:
+        '''Identifica a versão do arquivo sem lê-lo (tipo, mtime, tamanho, inode); None se ele não existe.'''
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (kind, stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def reload_if_changed(self) -> bool:
+        '''Carrega e publica uma nova versão se o arquivo mudou; retorna True se trocou.'''
+        with self._lock:
+            kind, path = self.source()
+            if kind == 'csv' and self._store is None and os.path.exists(path):
+                # sem dataset colunar na inicialização: converte o CSV uma única vez
+                kind, path = self.convert_csv()
+            stamp = self.stamp(kind, path)
+            if stamp is None or stamp == self._stamp:
+                return False
+
+            store = self.load(kind)
+            self._stamp = stamp
+            if self._store is not None and store.version == self._store.version:
+                return False
+            store.build_derived(self._store)
+
+            for callback in self._listeners:
+                try:
+                    callback(store)
+                except Exception as e:
+                    print(f"Erro ao preparar a versão {store.version} do catálogo: {e}")
+            # troca atômica da referência
+            self._store = store
+            return True
+
+    def start_watching(self, on_change: Callable[[], None] | None = None):
+        '''
+        Verifica o arquivo a cada poll_interval segundos numa thread em segundo plano
+        e carrega cada nova versão. Com `on_change`, a thread não carrega nada: só
+        chama on_change (uma vez por mudança) e deixa a carga para quem for avisado.
+        '''
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        target = self._watch if on_change is None else self._notify
+        self._watcher = threading.Thread(target=target, args=(on_change,) if on_change else (),
+                                         name='catalog-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(self.poll_interval)
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                print(f"Erro ao recarregar o catálogo: {e}")
+
+    def _notify(self, on_change: Callable[[], None]):
+        notified = None
+        while not self._stop.wait(self.poll_interval):
+            try:
+                stamp = self.stamp(*self.source())
+                if stamp is not None and stamp not in (self._stamp, notified):
+                    notified = stamp
+                    on_change()
+            except Exception as e:
+                print(f"Erro ao verificar o catálogo: {e}")
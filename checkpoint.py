@@ -0,0 +1,87 @@
+'''
+Esse módulo guarda o estado de um scraping em andamento num SQLite, para que
+um crawl interrompido (erro, deploy, processo morto) possa ser retomado:
+
+    -books: os livros já extraídos, um por id de produto (duplicados são
+     descartados), com a posição de cada um no site para manter a ordem do CSV
+    -done: as URLs de livros já processadas, que não são baixadas de novo
+
+O checkpoint é gravado em lotes pelo estágio de escrita do scraping. Quando o
+scraping termina e o dataset é publicado, o arquivo é removido; um novo
+scraping só retoma o anterior se ele for do mesmo site.
+'''
+
+import os
+import sqlite3
+
+import pandas as pd
+
+COLUMNS = ['id', 'title', 'category', 'price', 'rating', 'availability', 'image_links']
+
+
+class CrawlCheckpoint:
+    def __init__(self, path: str, base_url: str, resume: bool = True):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS books (
+                id TEXT PRIMARY KEY,
+                category_order INTEGER NOT NULL,
+                book_order INTEGER NOT NULL,
+                title TEXT, category TEXT, price TEXT, rating INTEGER,
+                availability INTEGER, image_links TEXT
+            );
+            CREATE INDEX IF NOT EXISTS books_order ON books (category_order, book_order);
+            CREATE TABLE IF NOT EXISTS done (url TEXT PRIMARY KEY);
+        ''')
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'base_url'").fetchone()
+        if not resume or row is None or row[0] != base_url:
+            self.reset(base_url)
+        self.resumed = self.count()
+
+    def reset(self, base_url: str):
+        self.conn.execute('DELETE FROM books')
+        self.conn.execute('DELETE FROM done')
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('base_url', ?)", (base_url,))
+        self.conn.commit()
+
+    def is_done(self, url: str) -> bool:
+        return self.conn.execute('SELECT 1 FROM done WHERE url = ?', (url,)).fetchone() is not None
+
+    def add(self, batch: list[tuple[str, tuple, tuple]]):
+        '''Grava (url, (ordem da categoria, ordem do livro), registro) e marca as URLs como feitas.'''
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO books VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(record[0], *order, *record[1:]) for _, order, record in batch],
+            )
+            self.conn.executemany('INSERT OR IGNORE INTO done (url) VALUES (?)', [(url,) for url, _, _ in batch])
+
+    def count(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM books').fetchone()[0]
+
+    def iter_frames(self, chunk_size: int = 10000):
+        '''Os livros na ordem do site, em DataFrames de até chunk_size linhas.'''
+        cursor = self.conn.execute(f'''
+            SELECT {", ".join(COLUMNS)} FROM books ORDER BY category_order, book_order
+        ''')
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield pd.DataFrame(rows, columns=COLUMNS)
+
+    def close(self):
+        self.conn.close()
+
+    def remove(self):
+        '''Descarta o checkpoint depois de um scraping concluído.'''
+        self.close()
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(self.path + suffix)
+            except FileNotFoundError:
+                pass
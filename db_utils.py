@@ -1,21 +1,269 @@
-from sqlalchemy import create_engine, text
+'''
+Esse módulo grava os logs das requisições no banco (DATABASE_URL).
+
+O SQLAlchemy é importado e o engine é criado só quando o primeiro lote de logs
+é gravado, pela thread do LogWriter: importar este módulo (e o api.py) não
+abre conexão nem paga o import do SQLAlchemy no início do processo.
+'''
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from functools import cache
+import atexit
 import os
+import queue
+import threading
+import time
+
+import metrics
+
+# Configuração do gravador de logs em segundo plano
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", 200))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", 1.0))
+LOG_TRIM_INTERVAL = float(os.getenv("LOG_TRIM_INTERVAL", 60.0))
+# por quanto tempo são mantidos os logs individuais e os agregados por minuto
+LOG_RETENTION_HOURS = float(os.getenv("LOG_RETENTION_HOURS", 24))
+LOG_ROLLUP_RETENTION_DAYS = float(os.getenv("LOG_ROLLUP_RETENTION_DAYS", 90))
+# linhas apagadas por DELETE na retenção (lotes curtos não seguram locks por muito tempo)
+LOG_DELETE_BATCH = int(os.getenv("LOG_DELETE_BATCH", 5000))
+
+INSERT_LOG = """
+    INSERT INTO logs (endpoint, status_code, timestamp)
+    VALUES (:endpoint, :status_code, :timestamp)
+"""
+
+UPSERT_ROLLUP = """
+    INSERT INTO logs_per_minute (bucket, endpoint, status_code, requests)
+    VALUES (:bucket, :endpoint, :status_code, :requests)
+    ON CONFLICT (bucket, endpoint, status_code)
+    DO UPDATE SET requests = logs_per_minute.requests + excluded.requests
+"""
+
+# retenção em lotes: cada DELETE remove no máximo :batch linhas antigas, usando o índice de tempo
+DELETE_OLD_LOGS = """
+    DELETE FROM logs
+    WHERE id IN (SELECT id FROM logs WHERE timestamp < :cutoff LIMIT :batch)
+"""
+
+DELETE_OLD_ROLLUPS = """
+    DELETE FROM logs_per_minute
+    WHERE bucket < :cutoff
+"""
+
+
+@cache
+def get_engine():
+    from sqlalchemy import create_engine
+    return create_engine(os.getenv("DATABASE_URL"))
+
+
+def dispose_engine():
+    '''Descarta as conexões herdadas de outro processo (ver gunicorn.conf.py), se o engine já existir.'''
+    if get_engine.cache_info().currsize:
+        get_engine().dispose(close=False)
+
+
+@cache
+def sql(statement: str):
+    from sqlalchemy import text
+    return text(statement)
+
+
+def init_schema(engine=None):
+    '''Cria as tabelas de logs (se não existirem) e o índice por tempo.'''
+    from sqlalchemy import MetaData, Table, Column, Index, Integer, BigInteger, String, DateTime
+
+    engine = engine or get_engine()
+    # logs: uma linha por requisição (só as recentes)
+    # logs_per_minute: quantidade de requisições por minuto, endpoint e status (o histórico)
+    metadata = MetaData()
+    logs_table = Table(
+        "logs", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("endpoint", String),
+        Column("status_code", Integer),
+        Column("timestamp", DateTime),
+    )
+    Table(
+        "logs_per_minute", metadata,
+        Column("bucket", DateTime, primary_key=True),
+        Column("endpoint", String, primary_key=True),
+        Column("status_code", Integer, primary_key=True),
+        Column("requests", BigInteger, nullable=False),
+    )
+    # criado à parte porque a tabela logs pode já existir sem ele
+    logs_timestamp_index = Index("ix_logs_timestamp", logs_table.c.timestamp)
+
+    metadata.create_all(engine, checkfirst=True)
+    logs_timestamp_index.create(engine, checkfirst=True)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def minute_bucket(timestamp: datetime) -> datetime:
+    return timestamp.replace(second=0, microsecond=0)
+
+
+def rollup(batch: list[dict]) -> list[dict]:
+    '''Agrega os logs em contagens por (minuto, endpoint, status).'''
+    counts = Counter((minute_bucket(log["timestamp"]), log["endpoint"], log["status_code"]) for log in batch)
+    return [{"bucket": bucket, "endpoint": endpoint, "status_code": status_code, "requests": requests}
+            for (bucket, endpoint, status_code), requests in counts.items()]
+
+
+def write_logs(conn, batch: list[dict]):
+    '''Grava os logs e atualiza os agregados na mesma transação.'''
+    conn.execute(sql(INSERT_LOG), batch)
+    conn.execute(sql(UPSERT_ROLLUP), rollup(batch))
+
+
+class LogWriter:
+    '''
+    Grava os logs de requisição fora do event loop.
+
+    As requisições apenas colocam o registro numa fila limitada (sem bloquear);
+    uma thread em segundo plano insere os registros em lote (executemany) a cada
+    `flush_interval` segundos ou quando junta `batch_size` registros, somando
+    também as contagens por minuto em logs_per_minute. A cada `trim_interval`
+    segundos apaga, em lotes, os logs e os agregados mais antigos que a
+    retenção. Com a fila cheia o registro é descartado e contabilizado em `dropped`.
+    '''
+
+    def __init__(self, engine=None, queue_size: int = LOG_QUEUE_SIZE, batch_size: int = LOG_BATCH_SIZE,
+                 flush_interval: float = LOG_FLUSH_INTERVAL, trim_interval: float = LOG_TRIM_INTERVAL,
+                 retention_hours: float = LOG_RETENTION_HOURS,
+                 rollup_retention_days: float = LOG_ROLLUP_RETENTION_DAYS):
+        self.engine = engine
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.trim_interval = trim_interval
+        self.retention = timedelta(hours=retention_hours)
+        self.rollup_retention = timedelta(days=rollup_retention_days)
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_trim = time.monotonic()
+        self._schema_ready = False
+
+    def submit(self, endpoint: str, status_code: int) -> bool:
+        '''Enfileira um log sem bloquear; retorna False se ele foi descartado.'''
+        self.start()
+        try:
+            self.queue.put_nowait({"endpoint": endpoint, "status_code": status_code, "timestamp": utcnow()})
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        '''Grava o que ainda está na fila e encerra a thread.'''
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            elif self._stop.is_set():
+                break
+
+            if time.monotonic() - self._last_trim >= self.trim_interval:
+                self._trim()
+        self._trim()
+
+    def _next_batch(self) -> list[dict]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            # ao encerrar, apenas drena o que já está na fila
+            timeout = 0 if self._stop.is_set() else deadline - time.monotonic()
+            try:
+                if timeout <= 0:
+                    batch.append(self.queue.get_nowait())
+                else:
+                    batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _ensure_schema(self):
+        if not self._schema_ready:
+            # sem engine, usa o do DATABASE_URL (criado aqui, na thread do LogWriter)
+            self.engine = self.engine or get_engine()
+            init_schema(self.engine)
+            self._schema_ready = True
+
+    def _write(self, batch: list[dict]):
+        start = time.perf_counter()
+        try:
+            self._ensure_schema()
+            with self.engine.begin() as conn:
+                write_logs(conn, batch)
+            self.written += len(batch)
+            metrics.registry.observe_stage('gravacao_logs', time.perf_counter() - start)
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"Erro ao gravar {len(batch)} logs: {e}")
+
+    def _trim(self):
+        self._last_trim = time.monotonic()
+        try:
+            self._ensure_schema()
+            now = utcnow()
+            while True:
+                with self.engine.begin() as conn:
+                    deleted = conn.execute(sql(DELETE_OLD_LOGS), {"cutoff": now - self.retention,
+                                                                  "batch": LOG_DELETE_BATCH}).rowcount
+                if deleted < LOG_DELETE_BATCH or self._stop.is_set():
+                    break
+            with self.engine.begin() as conn:
+                conn.execute(sql(DELETE_OLD_ROLLUPS), {"cutoff": minute_bucket(now - self.rollup_retention)})
+        except Exception as e:
+            print(f"Erro ao aplicar retenção dos logs: {e}")
+
+
+log_writer = LogWriter()
+atexit.register(log_writer.stop)
+
+
+def log_writer_metrics() -> list[tuple[str, str, str, int]]:
+    '''Estado da fila de gravação dos logs, exposto no /metrics.'''
+    stats = log_writer.stats()
+    return [
+        ('log_writer_queued', 'gauge', 'Logs na fila aguardando gravação', stats['queued']),
+        ('log_writer_written_total', 'counter', 'Logs gravados no banco', stats['written']),
+        ('log_writer_dropped_total', 'counter', 'Logs descartados com a fila cheia', stats['dropped']),
+        ('log_writer_failed_total', 'counter', 'Logs perdidos em falhas de gravação', stats['failed']),
+    ]
+
 
-engine = create_engine(os.getenv("DATABASE_URL"))
-
-def log_event(endpoint: str, status_code: int):
-    with engine.begin() as conn:
-        
-        conn.execute(text("""
-            DELETE FROM logs
-            WHERE id NOT IN (
-                SELECT id FROM logs
-                ORDER BY timestamp DESC
-                LIMIT 49
-            )
-        """))
-
-        conn.execute(text("""
-            INSERT INTO logs (endpoint, status_code)
-            VALUES (:endpoint, :status_code)
-        """), {"endpoint": endpoint, "status_code": status_code})
\ No newline at end of file
+metrics.registry.add_collector(log_writer_metrics)
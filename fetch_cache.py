@@ -0,0 +1,80 @@
+'''
+Esse módulo guarda, para cada URL de livro já baixada, os validadores HTTP
+(ETag / Last-Modified), o hash do conteúdo e o registro extraído da página.
+
+No scraping incremental o crawler envia requisições condicionais com esses
+validadores; quando o servidor responde 304, ou quando o conteúdo baixado tem o
+mesmo hash, o registro salvo é reaproveitado sem fazer o parsing de novo.
+'''
+
+import hashlib
+import json
+import sqlite3
+import time
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha1(content).hexdigest()
+
+
+class FetchCache:
+    def __init__(self, path: str = 'fetch_cache.db'):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT NOT NULL,
+                record TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        ''')
+        self.conn.commit()
+
+    def get(self, url: str) -> dict | None:
+        row = self.conn.execute(
+            'SELECT etag, last_modified, content_hash, record FROM pages WHERE url = ?', (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, digest, record = row
+        return {
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_hash": digest,
+            "record": tuple(json.loads(record)),
+        }
+
+    def put(self, url: str, etag: str | None, last_modified: str | None, digest: str, record: tuple):
+        self.conn.execute('''
+            INSERT INTO pages (url, etag, last_modified, content_hash, record, fetched_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (url) DO UPDATE SET
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                content_hash = excluded.content_hash,
+                record = excluded.record,
+                fetched_at = excluded.fetched_at
+        ''', (url, etag, last_modified, digest, json.dumps(record, ensure_ascii=False), time.time()))
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def conditional_headers(cached: dict | None) -> dict:
+    '''Headers de requisição condicional a partir da entrada do cache.'''
+    headers = {}
+    if cached:
+        if cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached['last_modified']:
+            headers['If-Modified-Since'] = cached['last_modified']
+    return headers
@@ -0,0 +1,88 @@
+'''
+Configuração do modo multi-worker: gunicorn com workers do uvicorn.
+
+Uso: gunicorn api:app -c gunicorn.conf.py
+
+Com preload_app o api.py é importado e o dataset (índices, estatísticas) é
+carregado uma única vez no processo master, antes do fork. Os workers
+herdam essas páginas de memória por copy-on-write em vez de cada um carregar a
+sua cópia, e o gc.freeze() antes do fork evita que o coletor de lixo dos
+workers escreva nesses objetos (o que forçaria a cópia das páginas).
+
+Novas versões do dataset também são carregadas só no master. Uma thread do
+master observa o data/CURRENT e, quando ele muda, envia um SIGHUP ao próprio
+master. No on_reload o master carrega a nova versão e congela o gc de novo.
+Depois o gunicorn cria os novos workers (forks da versão atual) e encerra os
+antigos, que terminam as requisições em andamento (graceful_timeout). Assim
+cada worker é sempre um fork recente da versão publicada, e a memória não
+cresce com o número de workers a cada reload. Os workers não observam o
+dataset nem recarregam sozinhos (CATALOG_RELOAD=master, ver api.py).
+'''
+
+import gc
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+
+# os workers deixam a recarga do dataset para o master (ver acima)
+os.environ['CATALOG_RELOAD'] = 'master'
+# métricas somadas entre os workers (ver metrics.py): um diretório novo a cada
+# início do gunicorn (o arquivo é executado de novo a cada SIGHUP, mas o ambiente fica)
+if not os.getenv('METRICS_DIR'):
+    os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='books-metrics-')
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'uvicorn.workers.UvicornWorker'
+preload_app = True
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+# reinicia os workers aos poucos (vazamentos de memória)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+accesslog = None
+# IPs dos proxies confiáveis para o X-Forwarded-For (usado no limite de logins por IP).
+# Nunca '*': o uvicorn usaria a primeira entrada do cabeçalho, que o cliente controla.
+# No Heroku o router não tem IP fixo; o auth_utils.throttle_ip usa a última entrada,
+# acrescentada pelo próprio router
+forwarded_allow_ips = os.getenv('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+
+def when_ready(server):
+    # o import do api.py não carrega o dataset (isso fica no lifespan de cada
+    # worker); aqui ele é carregado no master, antes do fork, para ser compartilhado
+    import api
+    api.preload()
+    # tudo o que foi carregado pelo preload passa para a geração permanente do gc
+    gc.collect()
+    gc.freeze()
+    # a thread só confere o arquivo; a carga acontece no on_reload, na thread principal
+    api.catalog.start_watching(on_change=lambda: os.kill(os.getpid(), signal.SIGHUP))
+
+
+def on_reload(server):
+    # roda no master antes de criar os novos workers (SIGHUP)
+    import api
+    gc.unfreeze()
+    api.preload()
+    gc.collect()
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    # os contadores do worker encerrado continuam somados no /metrics
+    import metrics
+    metrics.archive(worker.pid)
+
+
+def on_exit(server):
+    if os.environ['METRICS_DIR'].startswith(os.path.join(tempfile.gettempdir(), 'books-metrics-')):
+        shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+
+
+def post_fork(server, worker):
+    # conexões abertas pelo master não podem ser compartilhadas entre processos
+    from db_utils import dispose_engine
+    dispose_engine()
@@ -0,0 +1,247 @@
+'''
+Esse módulo executa o scraping como um job em segundo plano.
+
+O trigger da API apenas enfileira o job e devolve o seu id; o crawl roda numa
+thread separada, fora do event loop, e o progresso (páginas baixadas, livros
+processados, livros inalterados, erros e tempo decorrido) pode ser consultado pelo id. Enquanto
+existe um job em andamento, novos triggers reaproveitam esse mesmo job.
+
+Com vários workers (gunicorn.conf.py), cada processo tem o seu JobManager; um
+lock de arquivo impede que dois workers rodem o scraping ao mesmo tempo. O
+worker que tem o lock publica o estado dos jobs num arquivo JSON (state_path),
+que os outros workers leem: um trigger recebido por outro worker devolve o job
+em andamento, e a consulta pelo id funciona em qualquer worker.
+'''
+
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+# status possíveis de um job
+QUEUED, RUNNING, SUCCESS, FAILED = 'queued', 'running', 'success', 'failed'
+# campos gravados no arquivo de estado compartilhado
+STATE_FIELDS = ('id', 'status', 'pages_fetched', 'books_parsed', 'unchanged', 'errors', 'error',
+                'duration', 'created_at', 'started_at', 'finished_at')
+# intervalo entre as publicações do progresso no arquivo de estado, em segundos
+PUBLISH_INTERVAL = 0.5
+# tempo máximo de espera pelo job de outro processo que acabou de pegar o lock
+SHARED_WAIT = 2.0
+
+
+class ScrapeJob:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = QUEUED
+        self.pages_fetched = 0
+        self.books_parsed = 0
+        self.unchanged = 0
+        self.errors = 0
+        self.error = None
+        self.duration = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def incr(self, counter: str, n: int = 1):
+        '''Incrementa um contador de progresso (chamado pelas threads do scraping).'''
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + n)
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "pages_fetched": self.pages_fetched,
+            "books_parsed": self.books_parsed,
+            "unchanged": self.unchanged,
+            "errors": self.errors,
+            "elapsed": round(self.elapsed, 1),
+            "duration": None if self.duration is None else round(self.duration, 1),
+            "error": self.error,
+        }
+
+    def to_state(self) -> dict:
+        with self._lock:
+            return {field: getattr(self, field) for field in STATE_FIELDS}
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'ScrapeJob':
+        '''Cópia de um job publicado por outro processo.'''
+        job = cls()
+        for field in STATE_FIELDS:
+            setattr(job, field, state.get(field))
+        return job
+
+
+class JobManager:
+    def __init__(self, target: Callable[..., float], max_history: int = 20,
+                 on_success: Callable[[], object] | None = None, lock_path: str | None = None,
+                 state_path: str | None = None):
+        # target recebe o job em `progress` e retorna a duração em segundos
+        self.target = target
+        # chamado na própria thread do job depois de um scraping bem-sucedido
+        self.on_success = on_success
+        self.max_history = max_history
+        # arquivo usado como lock entre processos (None desativa)
+        self.lock_path = lock_path if fcntl is not None else None
+        # arquivo JSON com os jobs, compartilhado entre processos (None desativa)
+        self.state_path = state_path if self.lock_path is not None else None
+        self._jobs = OrderedDict()
+        self._active = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scraping')
+
+    def submit(self) -> tuple[ScrapeJob, bool]:
+        '''Enfileira um novo job, ou devolve o que já está rodando (created=False), neste ou em outro processo.'''
+        with self._lock:
+            if self._active is not None and self._active.active:
+                return self._active, False
+
+            lock_file = None
+            if self.lock_path is not None:
+                deadline = time.monotonic() + SHARED_WAIT
+                while (lock_file := self._try_lock()) is None:
+                    job = self._shared_active()
+                    if job is not None:
+                        return job, False
+                    # o outro processo ainda não publicou o job (ou o lock é de um processo sem estado)
+                    if time.monotonic() > deadline:
+                        raise RuntimeError('scraping já em andamento em outro processo')
+                    time.sleep(0.05)
+
+            job = ScrapeJob()
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_history:
+                self._jobs.popitem(last=False)
+            self._active = job
+            # publicado antes de responder: um trigger em outro worker já encontra o job
+            self._publish(job)
+            self._executor.submit(self._execute, job, lock_file)
+            return job, True
+
+    def get(self, job_id: str) -> ScrapeJob | None:
+        job = self._jobs.get(job_id)
+        if job is not None or self.state_path is None:
+            return job
+        state = next((state for state in self._read_state() if state['id'] == job_id), None)
+        if state is None:
+            return None
+        job = ScrapeJob.from_state(state)
+        if job.active and self._lock_is_free():
+            # o processo que rodava o job terminou sem publicar o fim
+            job.status = FAILED
+            job.error = 'processo do scraping encerrado antes do fim do job'
+        return job
+
+    def _execute(self, job: ScrapeJob, lock_file=None):
+        job.status = RUNNING
+        job.started_at = time.time()
+        stop = threading.Event()
+        publisher = None
+        if self.state_path is not None:
+            publisher = threading.Thread(target=self._publish_progress, args=(job, stop),
+                                         name='scraping-state', daemon=True)
+            publisher.start()
+        try:
+            job.duration = self.target(progress=job)
+            if self.on_success is not None:
+                self.on_success()
+            job.status = SUCCESS
+        except Exception as e:
+            job.error = f"{type(e).__name__} - {str(e)}"
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            stop.set()
+            if publisher is not None:
+                publisher.join()
+            # o estado final é gravado antes de liberar o lock
+            self._publish(job)
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+    def _try_lock(self):
+        '''Abre e trava o arquivo de lock; None se outro processo já o tem.'''
+        f = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return None
+        return f
+
+    def _lock_is_free(self) -> bool:
+        lock_file = self._try_lock()
+        if lock_file is None:
+            return False
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+        return True
+
+    def _read_state(self) -> list[dict]:
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return json.load(f)['jobs']
+        except (OSError, ValueError, KeyError):
+            return []
+
+    def _shared_active(self) -> ScrapeJob | None:
+        '''Job em andamento publicado pelo processo que tem o lock.'''
+        active = [state for state in self._read_state() if state['status'] in (QUEUED, RUNNING)]
+        if not active:
+            return None
+        return ScrapeJob.from_state(max(active, key=lambda state: state['created_at']))
+
+    def _publish(self, job: ScrapeJob):
+        '''Grava o job no arquivo de estado (só quem tem o lock escreve nele).'''
+        if self.state_path is None:
+            return
+        current = job.to_state()
+        jobs = [state for state in self._read_state() if state['id'] != job.id]
+        for state in jobs:
+            if state['status'] in (QUEUED, RUNNING):
+                # com o lock nas mãos deste processo, qualquer outro job ativo foi interrompido
+                state['status'] = FAILED
+                state['error'] = 'processo do scraping encerrado antes do fim do job'
+        jobs = (jobs + [current])[-self.max_history:]
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix='.jobs-', suffix='.json', dir=directory)
+        except OSError as e:
+            print(f"Erro ao publicar o estado do job {job.id}: {e}")
+            return
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'jobs': jobs}, f)
+            # troca atômica: quem lê vê o arquivo antigo ou o novo, nunca um pela metade
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print(f"Erro ao publicar o estado do job {job.id}: {e}")
+            os.unlink(tmp_path)
+
+    def _publish_progress(self, job: ScrapeJob, stop: threading.Event):
+        while not stop.wait(PUBLISH_INTERVAL):
+            self._publish(job)
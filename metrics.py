@@ -0,0 +1,349 @@
+'''
+Esse módulo agrega as métricas das requisições:
+
+    -duração de cada requisição, por método, rota (o template, ex:
+     /api/v1/books/{id}) e status
+    -tamanho das respostas em bytes, por rota
+    -tempo das etapas internas marcadas com `stage()` (ex: consulta ao
+     catálogo, serialização) e da gravação dos logs no banco
+
+Os valores vão para histogramas com buckets fixos, então o custo por
+requisição é constante e a memória não cresce com o tráfego. Os histogramas
+são expostos no formato texto do Prometheus (/api/v1/metrics) e num resumo
+com percentis estimados por rota (/api/v1/metrics/summary).
+
+Outros módulos podem acrescentar contadores e gauges próprios ao /metrics com
+`add_collector` (ex: a fila de gravação dos logs, em db_utils.py), sem que este
+módulo precise importá-los.
+
+Com vários workers (gunicorn.conf.py), cada processo grava as suas métricas
+num arquivo por pid em METRICS_DIR: uma thread grava a cada
+METRICS_FLUSH_INTERVAL segundos (se algo mudou), e cada exposição também
+grava. O /metrics e o /metrics/summary somam esses arquivos e mostram o
+serviço todo, seja qual for o worker que responde. Os contadores dos workers
+encerrados continuam somados (ver archive), então as séries não voltam para
+trás quando os workers são trocados.
+'''
+
+import bisect
+import contextvars
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+# buckets de cada família de histogramas do MetricsRegistry
+FAMILIES = {'durations': DURATION_BUCKETS, 'sizes': SIZE_BUCKETS, 'stages': DURATION_BUCKETS}
+UNMATCHED_ROUTE = '<sem rota>'
+
+# diretório compartilhado pelos workers (gunicorn.conf.py); sem ele, cada processo expõe só as suas métricas
+METRICS_DIR = os.getenv('METRICS_DIR')
+# de quanto em quanto tempo (segundos) cada processo grava as suas métricas no diretório
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1.0))
+BACKGROUND_ROUTE = '<segundo plano>'
+
+# etapas medidas na requisição atual (o middleware cria o dicionário)
+_stages = contextvars.ContextVar('stages', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # o último é o +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    @classmethod
+    def from_state(cls, buckets, counts: list[int], total: float, count: int) -> 'Histogram':
+        histogram = cls(buckets)
+        histogram.add(counts, total, count)
+        return histogram
+
+    def add(self, counts: list[int], total: float, count: int):
+        '''Soma outro histograma com os mesmos buckets (ex: de outro worker).'''
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.sum += total
+        self.count += count
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        '''Estimativa por interpolação linear dentro do bucket (como o histogram_quantile).'''
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    def __init__(self, directory: str | None = METRICS_DIR, flush_interval: float = METRICS_FLUSH_INTERVAL):
+        self.durations = {}  # (método, rota, status) -> Histogram
+        self.sizes = {}      # (método, rota) -> Histogram
+        self.stages = {}     # (rota, etapa) -> Histogram
+        self.collectors = []  # funções chamadas a cada exposição
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._flusher = None
+
+    def add_collector(self, collector: Callable[[], list[tuple[str, str, str, float]]]):
+        '''Registra uma função que retorna métricas (nome, tipo, descrição, valor) no momento da coleta.'''
+        self.collectors.append(collector)
+
+    def _observe(self, family: dict, key: tuple, buckets, value: float):
+        with self._lock:
+            histogram = family.get(key)
+            if histogram is None:
+                histogram = family[key] = Histogram(buckets)
+            histogram.observe(value)
+        if self.directory:
+            self._dirty = True
+            self._start_flusher()
+
+    def _start_flusher(self):
+        # uma thread por processo: a do master não passa para os workers no fork
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_periodically, name='metrics-flush', daemon=True)
+                self._flusher.start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if self._dirty:
+                self._dirty = False
+                self.flush()
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, size: int, stages: dict):
+        self._observe(self.durations, (method, route, str(status)), DURATION_BUCKETS, seconds)
+        self._observe(self.sizes, (method, route), SIZE_BUCKETS, size)
+        for name, stage_seconds in stages.items():
+            self._observe(self.stages, (route, name), DURATION_BUCKETS, stage_seconds)
+
+    def observe_stage(self, name: str, seconds: float, route: str = BACKGROUND_ROUTE):
+        self._observe(self.stages, (route, name), DURATION_BUCKETS, seconds)
+
+    def collect(self) -> list[list]:
+        collected = []
+        for collector in self.collectors:
+            try:
+                collected.extend([list(metric) for metric in collector()])
+            except Exception as e:
+                print(f"Erro ao coletar métricas de {collector.__name__}: {e}")
+        return collected
+
+    def state(self) -> dict:
+        '''Métricas deste processo em JSON: histogramas como [chave, contagens, soma, total].'''
+        with self._lock:
+            state = {name: [[list(key), list(h.counts), h.sum, h.count] for key, h in getattr(self, name).items()]
+                     for name in FAMILIES}
+        state['collected'] = self.collect()
+        return state
+
+    def flush(self):
+        '''Grava o estado deste processo em `directory`, num arquivo por pid (troca atômica).'''
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        try:
+            write_state(path, self.state())
+        except OSError as e:
+            print(f"Erro ao gravar as métricas em {path}: {e}")
+
+    def merged(self) -> dict:
+        '''Histogramas (chave -> Histogram) e métricas dos coletores somados de todos os processos.'''
+        if self.directory:
+            self.flush()
+            state = merge_states(read_states(self.directory))
+        else:
+            state = self.state()
+        merged = {name: {tuple(key): Histogram.from_state(FAMILIES[name], counts, total, count)
+                         for key, counts, total, count in state[name]}
+                  for name in FAMILIES}
+        merged['collected'] = state['collected']
+        return merged
+
+    def prometheus(self) -> str:
+        '''Histogramas no formato texto de exposição do Prometheus.'''
+        merged = self.merged()
+        lines = []
+        families = [
+            ('http_request_duration_seconds', 'Duração das requisições', ('method', 'route', 'status'), 'durations'),
+            ('http_response_size_bytes', 'Tamanho das respostas', ('method', 'route'), 'sizes'),
+            ('stage_duration_seconds', 'Duração das etapas internas', ('route', 'stage'), 'stages'),
+        ]
+        for name, description, label_names, family in families:
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} histogram')
+            for key, histogram in sorted(merged[family].items()):
+                labels = ','.join(f'{label}="{escape(value)}"' for label, value in zip(label_names, key))
+                cumulative = 0
+                for bound, bucket_count in zip([*histogram.buckets, '+Inf'], histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        for name, kind, description, value in merged['collected']:
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> list[dict]:
+        '''Uma linha por rota, da que mais consumiu tempo para a que menos consumiu.'''
+        merged = self.merged()
+        routes = {}
+        for (method, route, status), histogram in merged['durations'].items():
+            routes.setdefault((method, route), Histogram(DURATION_BUCKETS)).add(histogram.counts, histogram.sum,
+                                                                               histogram.count)
+        errors = {}
+        for (method, route, status), histogram in merged['durations'].items():
+            if int(status) >= 500:
+                errors[(method, route)] = errors.get((method, route), 0) + histogram.count
+        stages = {}
+        for (route, stage_name), histogram in merged['stages'].items():
+            stages.setdefault(route, {})[stage_name] = round(histogram.sum / histogram.count * 1000, 3)
+
+        rows = []
+        for (method, route), histogram in routes.items():
+            size = merged['sizes'].get((method, route))
+            rows.append({
+                'método': method,
+                'rota': route,
+                'requisições': histogram.count,
+                'erros': errors.get((method, route), 0),
+                'tempo total (s)': round(histogram.sum, 3),
+                'média (ms)': round(histogram.sum / histogram.count * 1000, 3),
+                'p50 (ms)': round(histogram.quantile(0.5) * 1000, 3),
+                'p90 (ms)': round(histogram.quantile(0.9) * 1000, 3),
+                'p99 (ms)': round(histogram.quantile(0.99) * 1000, 3),
+                'bytes médios': round(size.sum / size.count) if size and size.count else 0,
+                'etapas (ms médios)': stages.get(route, {}),
+            })
+        background = stages.get(BACKGROUND_ROUTE)
+        rows.sort(key=lambda row: row['tempo total (s)'], reverse=True)
+        if background:
+            rows.append({'método': '-', 'rota': BACKGROUND_ROUTE, 'etapas (ms médios)': background})
+        return rows
+
+
+def write_state(path: str, state: dict):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def locked(directory: str, operation: int):
+    '''Leitores (LOCK_SH) não veem um arquivo arquivado pela metade (LOCK_EX, ver archive).'''
+    with open(os.path.join(directory, '.lock'), 'a') as lock:
+        fcntl.flock(lock, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def read_states(directory: str) -> list[dict]:
+    states = []
+    with locked(directory, fcntl.LOCK_SH):
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            try:
+                with open(path) as f:
+                    states.append(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Erro ao ler as métricas de {path}: {e}")
+    return states
+
+
+def merge_states(states: list[dict]) -> dict:
+    '''Soma os histogramas e os valores dos coletores (na ordem em que aparecem) de vários processos.'''
+    merged = {}
+    for name, buckets in FAMILIES.items():
+        family = {}
+        for state in states:
+            for key, counts, total, count in state.get(name, []):
+                histogram = family.setdefault(tuple(key), Histogram(buckets))
+                histogram.add(counts, total, count)
+        merged[name] = [[list(key), h.counts, h.sum, h.count] for key, h in family.items()]
+    collected = {}
+    for state in states:
+        for name, kind, description, value in state.get('collected', []):
+            if name in collected:
+                collected[name][3] += value
+            else:
+                collected[name] = [name, kind, description, value]
+    merged['collected'] = list(collected.values())
+    return merged
+
+
+def archive(pid: int, directory: str | None = METRICS_DIR):
+    '''
+    Soma as métricas de um worker encerrado às dos que já saíram (archived.json)
+    e apaga o arquivo dele, para que os contadores não voltem para trás quando o
+    gunicorn troca os workers. Os gauges (ex: a fila de logs) morrem com o
+    processo. Chamado pelo master, no child_exit (ver gunicorn.conf.py).
+    '''
+    if not directory:
+        return
+    path = os.path.join(directory, f'{pid}.json')
+    archived = os.path.join(directory, 'archived.json')
+    with locked(directory, fcntl.LOCK_EX):
+        states = []
+        for state_path in (archived, path):
+            try:
+                with open(state_path) as f:
+                    states.append(json.load(f))
+            except FileNotFoundError:
+                continue
+        if not os.path.exists(path):
+            return
+        merged = merge_states(states)
+        merged['collected'] = [metric for metric in merged['collected'] if metric[1] == 'counter']
+        write_state(archived, merged)
+        os.remove(path)
+
+
+def escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def begin_request() -> dict:
+    '''Chamado pelo middleware: as etapas da requisição atual passam a ser guardadas aqui.'''
+    stages = {}
+    _stages.set(stages)
+    return stages
+
+
+@contextmanager
+def stage(name: str):
+    '''Mede uma etapa da requisição atual (acumula se a etapa se repetir).'''
+    stages = _stages.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+
+
+registry = MetricsRegistry()
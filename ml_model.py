@@ -1,5 +1,140 @@
-from basemodels import PredictionInput
+'''
+Esse módulo define o modelo que prevê o preço de um livro a partir das
+features (feature1 = availability, feature2 = rating).
 
-def fake_model(inputs: PredictionInput):
-    total = inputs.feature1 + inputs.feature2
-    return f'predição para as features dadas: {total}'
+O modelo é uma regressão linear guardada num artefato JSON (pesos + bias),
+carregado uma única vez quando a API sobe (no lifespan). A predição é vetorizada com NumPy:
+uma matriz (n, 2) é avaliada numa única operação, então pontuar o catálogo
+inteiro custa o mesmo que algumas linhas.
+
+O MicroBatcher agrupa as requisições de uma linha que chegam ao mesmo tempo
+numa única chamada vetorizada.
+
+Uso: python ml_model.py [books.csv] [model.json]
+    treina o modelo com o dataset e grava o artefato
+'''
+
+import asyncio
+import json
+import os
+import sys
+
+import numpy as np
+
+MODEL_PATH = 'model.json'
+FORMAT_VERSION = 1
+FEATURES = ('feature1', 'feature2')
+# colunas do dataset usadas como features e como label
+TRAINING_COLUMNS = ('availability', 'rating')
+LABEL_COLUMN = 'price'
+
+
+class LinearModel:
+    def __init__(self, weights, bias: float = 0.0, features=FEATURES):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.features = tuple(features)
+
+    def predict(self, X) -> np.ndarray:
+        '''Predição para cada linha de X (matriz n x len(features)).'''
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(self.features))
+        return X @ self.weights + self.bias
+
+    def to_dict(self) -> dict:
+        return {
+            'format': FORMAT_VERSION,
+            'features': list(self.features),
+            'weights': self.weights.tolist(),
+            'bias': self.bias,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LinearModel':
+        return cls(data['weights'], data['bias'], data['features'])
+
+
+def save_model(model: LinearModel, path: str = MODEL_PATH):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(model.to_dict(), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_model(path: str = MODEL_PATH) -> LinearModel:
+    '''Carrega o artefato; sem ele, usa a soma das features (o antigo modelo simulado).'''
+    try:
+        with open(path, encoding='utf-8') as f:
+            return LinearModel.from_dict(json.load(f))
+    except FileNotFoundError:
+        print(f'Modelo {path} não encontrado, usando o modelo simulado')
+        return LinearModel(np.ones(len(FEATURES)))
+
+
+def train(df) -> LinearModel:
+    '''Mínimos quadrados de price ~ availability + rating.'''
+    data = df[list(TRAINING_COLUMNS) + [LABEL_COLUMN]].apply(lambda column: column.astype('float64')).dropna()
+    X = data[list(TRAINING_COLUMNS)].to_numpy()
+    y = data[LABEL_COLUMN].to_numpy()
+    solution, *_ = np.linalg.lstsq(np.column_stack([X, np.ones(len(X))]), y, rcond=None)
+    return LinearModel(solution[:-1], solution[-1])
+
+
+def feature_matrix(rows, features=FEATURES) -> np.ndarray:
+    '''Converte linhas (objetos com as features ou listas na ordem das features) numa matriz.'''
+    rows = [[row[name] for name in features] if isinstance(row, dict) else row for row in rows]
+    X = np.array(rows, dtype=np.float64).reshape(-1, len(features)) if rows else np.empty((0, len(features)))
+    if X.shape[0] != len(rows) or not np.isfinite(X).all():
+        raise ValueError('linhas de features inválidas')
+    return X
+
+
+class MicroBatcher:
+    '''
+    Junta as predições de uma linha pedidas dentro de `max_delay` segundos (ou
+    até `max_batch` linhas) e as avalia numa única chamada a `predict`.
+    '''
+
+    def __init__(self, predict, max_batch: int = 256, max_delay: float = 0.002):
+        self.predict_batch = predict
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending = []
+        self._timer = None
+
+    async def predict(self, row) -> float:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            results = self.predict_batch(np.array([row for row, _ in batch], dtype=np.float64))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results.tolist()):
+            if not future.done():  # o cliente pode ter desistido da requisição
+                future.set_result(result)
+
+
+if __name__ == '__main__':
+    import pandas as pd
+
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else 'books.csv'
+    path = sys.argv[2] if len(sys.argv) > 2 else MODEL_PATH
+    model = train(pd.read_csv(csv_path))
+    save_model(model, path)
+    print(f'modelo treinado com {csv_path} gravado em {path}: pesos {model.weights.tolist()}, bias {model.bias}')
@@ -0,0 +1,175 @@
+'''
+Esse módulo extrai os dados das páginas do 'books.toscrape.com' com backends
+de parsing intercambiáveis:
+
+    -selectolax: o mais rápido, usado se o pacote estiver instalado
+    -lxml: usado se o pacote estiver instalado
+    -strainer: BeautifulSoup com SoupStrainer, que só monta os nós usados
+     (product_main, tabela de informações e imagem)
+    -html.parser: BeautifulSoup montando a árvore completa (implementação de referência)
+
+Todos os backends produzem exatamente a mesma tupla. O backend padrão é o mais
+rápido disponível e pode ser escolhido pela variável SCRAPER_PARSER.
+
+As funções são de nível de módulo e só dependem dos argumentos, então podem
+rodar em um ProcessPoolExecutor.
+
+Uso: python parsers.py PAGINA.html [PAGINA.html ...]
+    compara a saída de todos os backends disponíveis nas páginas salvas
+'''
+
+import os
+import re
+import sys
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+RATING_MAP = {'One': 1, 'Two': 2, 'Three': 3, 'Four': 4, 'Five': 5}
+STOCK_RE = re.compile(r'\((\d+)\s+available\)')
+
+
+def class_pattern(*names):
+    '''Regex que casa qualquer uma das classes no atributo class completo (o SoupStrainer não o separa).'''
+    return re.compile(r'(?:^|\s)(?:' + '|'.join(map(re.escape, names)) + r')(?:\s|$)')
+
+
+# só os nós da página de detalhe que são usados na extração
+BOOK_STRAINER = SoupStrainer(['div', 'table'], class_=class_pattern('product_main', 'table-striped', 'item'))
+CATEGORY_STRAINER = SoupStrainer(['article', 'li'], class_=class_pattern('product_pod', 'next'))
+
+
+def build_record(product_id, title, rating_classes, price_text, stock_text, image_src, category_page, base_url):
+    '''Normaliza os campos brutos extraídos da página na tupla do livro.'''
+    numeric_rating = RATING_MAP.get(rating_classes[1], 0)
+    price = price_text.strip().replace('£', '')
+    match = STOCK_RE.search(stock_text)
+    stock_number = int(match.group(1)) if match else 0
+    image_url = base_url + image_src.replace('../../', '')
+    category = category_page.split('/')[-2].split('_')[0]
+    return (product_id.strip(), title.strip(), category, price, numeric_rating, stock_number, image_url)
+
+
+def book_fields_soup(soup):
+    id_table = soup.find('table', class_='table table-striped')
+    product_main = soup.find('div', class_='col-sm-6 product_main')
+    return (
+        id_table.find('tr').find('td').text,
+        product_main.find('h1').text,
+        soup.find('p', class_='star-rating').get('class'),
+        soup.find('p', class_='price_color').text,
+        soup.find('p', class_='instock availability').text,
+        soup.find('img')['src'],
+    )
+
+
+def book_fields_selectolax(html):
+    tree = HTMLParser(html)
+    return (
+        tree.css_first('table.table-striped tr td').text(),
+        tree.css_first('div.product_main h1').text(),
+        tree.css_first('p.star-rating').attributes['class'].split(),
+        tree.css_first('p.price_color').text(),
+        tree.css_first('p.instock.availability').text(),
+        tree.css_first('img').attributes['src'],
+    )
+
+
+def book_fields_lxml(html):
+    tree = lxml.html.fromstring(html)
+
+    def first(xpath):
+        return tree.xpath(xpath)[0]
+
+    return (
+        first('//table[contains(@class, "table-striped")]//tr[1]/td[1]').text_content(),
+        first('//div[contains(@class, "product_main")]//h1').text_content(),
+        first('//p[contains(@class, "star-rating")]').get('class').split(),
+        first('//p[contains(@class, "price_color")]').text_content(),
+        first('//p[contains(@class, "instock") and contains(@class, "availability")]').text_content(),
+        first('//img').get('src'),
+    )
+
+
+def category_page_soup(soup):
+    hrefs = [book.find('h3').find('a')['href'] for book in soup.find_all('article', class_='product_pod')]
+    next_link = soup.find('li', class_='next')
+    return hrefs, next_link.find('a')['href'] if next_link else None
+
+
+def category_page_selectolax(html):
+    tree = HTMLParser(html)
+    hrefs = [node.attributes['href'] for node in tree.css('article.product_pod h3 a')]
+    next_link = tree.css_first('li.next a')
+    return hrefs, next_link.attributes['href'] if next_link else None
+
+
+def category_page_lxml(html):
+    tree = lxml.html.fromstring(html)
+    hrefs = tree.xpath('//article[contains(@class, "product_pod")]//h3/a/@href')
+    next_href = tree.xpath('//li[contains(@class, "next")]/a/@href')
+    return hrefs, next_href[0] if next_href else None
+
+
+BACKENDS = {
+    'html.parser': (
+        lambda html: book_fields_soup(BeautifulSoup(html, 'html.parser')),
+        lambda html: category_page_soup(BeautifulSoup(html, 'html.parser')),
+    ),
+    'strainer': (
+        lambda html: book_fields_soup(BeautifulSoup(html, 'html.parser', parse_only=BOOK_STRAINER)),
+        lambda html: category_page_soup(BeautifulSoup(html, 'html.parser', parse_only=CATEGORY_STRAINER)),
+    ),
+}
+if lxml is not None:
+    BACKENDS['lxml'] = (book_fields_lxml, category_page_lxml)
+if HTMLParser is not None:
+    BACKENDS['selectolax'] = (book_fields_selectolax, category_page_selectolax)
+
+
+def default_backend() -> str:
+    for name in ('selectolax', 'lxml', 'strainer'):
+        if name in BACKENDS:
+            return name
+
+
+DEFAULT_BACKEND = os.getenv('SCRAPER_PARSER') or default_backend()
+
+
+def parse_book(html, category_page, base_url, backend=None):
+    '''Extrai (id, título, categoria, preço, rating, estoque, imagem) de uma página de detalhe.'''
+    fields = BACKENDS[backend or DEFAULT_BACKEND][0](html)
+    return build_record(*fields, category_page, base_url)
+
+
+def parse_category_page(html, url, base_url, backend=None):
+    '''Extrai, numa única passada, as URLs dos livros e a próxima página da categoria.'''
+    hrefs, next_href = BACKENDS[backend or DEFAULT_BACKEND][1](html)
+    # inclui a URL da categoria para extrair depois
+    urls = [(base_url + 'catalogue/' + href.replace('../../../', ''), url) for href in hrefs]
+    return urls, urljoin(url, next_href) if next_href else None
+
+
+if __name__ == '__main__':
+    mismatches = 0
+    for path in sys.argv[1:]:
+        with open(path, 'rb') as f:
+            html = f.read()
+        expected = parse_book(html, 'catalogue/category/books/fixture_1/index.html', '', 'html.parser')
+        for name in BACKENDS:
+            result = parse_book(html, 'catalogue/category/books/fixture_1/index.html', '', name)
+            if result != expected:
+                mismatches += 1
+                print(f'{path} [{name}]: {result} != {expected}')
+    print(f'{len(sys.argv) - 1} páginas, backends {sorted(BACKENDS)}: {mismatches} divergências')
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,105 @@
+'''
+Esse módulo define a representação dos livros usada para servir as
+requisições e a serialização JSON das respostas:
+
+    -BookRecord: um livro com __slots__ (sem o dicionário por instância),
+     montado uma vez por versão do dataset. As categorias são internadas, então
+     livros da mesma categoria compartilham a mesma string.
+    -dumps: escreve o JSON direto dos registros, sem passar pelo
+     jsonable_encoder do FastAPI. Com o orjson (requirements.txt) os registros
+     são serializados sem montar um dicionário por livro. Na falta dele, usa o
+     json da biblioteca padrão, que monta um dicionário por livro. A saída é a
+     mesma: compacta, UTF-8 e NaN/infinito como null.
+
+O modelo Book (basemodels.py) continua descrevendo as respostas na
+documentação da API.
+'''
+
+import json
+import math
+import sys
+from dataclasses import dataclass
+
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FIELDS = ('id', 'title', 'category', 'price', 'rating', 'availability', 'image_links')
+
+
+@dataclass(slots=True)
+class BookRecord:
+    id: str
+    title: str
+    category: str
+    price: float
+    rating: int
+    availability: int
+    image_links: str
+
+    def __getitem__(self, field: str):
+        '''Acesso como dicionário (record['price']), para consultas por nome de campo.'''
+        return getattr(self, field)
+
+    def values(self) -> tuple:
+        return (self.id, self.title, self.category, self.price, self.rating, self.availability, self.image_links)
+
+    def to_dict(self) -> dict:
+        return dict(zip(FIELDS, self.values()))
+
+
+def from_frame(frame: pd.DataFrame) -> list[BookRecord]:
+    '''Um BookRecord por linha do DataFrame, na mesma ordem.'''
+    columns = {field: frame[field].tolist() for field in FIELDS}
+    # categorias repetidas passam a apontar para a mesma string
+    columns['category'] = [sys.intern(category) if isinstance(category, str) else category
+                           for category in columns['category']]
+    return [BookRecord(*values) for values in zip(*columns.values())]
+
+
+def finite(value):
+    '''NaN e infinito viram None (null), como no orjson; o json padrão os rejeita com allow_nan=False.'''
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def project(record: BookRecord, fields) -> dict:
+    '''Só alguns campos do livro (parâmetro `fields` da API).'''
+    return {field: finite(getattr(record, field)) for field in fields}
+
+
+def without_nan(content):
+    '''Cópia do conteúdo com NaN/infinito trocados por None, nos dicionários e listas aninhados.'''
+    if isinstance(content, dict):
+        return {key: without_nan(value) for key, value in content.items()}
+    if isinstance(content, (list, tuple)):
+        return [without_nan(value) for value in content]
+    return finite(content)
+
+
+def encode_default(value):
+    '''Tipos que o encoder não conhece: registros e escalares do numpy.'''
+    if isinstance(value, BookRecord):
+        return {field: finite(item) for field, item in zip(FIELDS, value.values())}
+    if hasattr(value, 'item'):
+        return finite(value.item())
+    raise TypeError(f'{type(value).__name__} não é serializável em JSON')
+
+
+_encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(',', ':'), default=encode_default)
+
+
+def dumps(content) -> bytes:
+    '''JSON compacto em UTF-8.'''
+    if orjson is not None:
+        # chaves não-string (ex: o histograma de ratings) viram texto, como no json padrão
+        return orjson.dumps(content, default=encode_default, option=orjson.OPT_NON_STR_KEYS)
+    try:
+        return _encoder.encode(content).encode('utf-8')
+    except ValueError:
+        # algum float NaN/infinito fora dos registros: refaz trocando-os por null
+        return _encoder.encode(without_nan(content)).encode('utf-8')
@@ -9,154 +9,347 @@ Para cada livro na página é extraído seu respectivo:
     -link da capa
     -preço
 
+O crawl é assíncrono (asyncio + httpx): as categorias, a paginação de cada
+categoria e as páginas de detalhe dos livros são baixadas de forma concorrente,
+com limite global de requisições simultâneas, limite de taxa por host e novas
+tentativas com backoff exponencial.
+
+No modo incremental (padrão) as páginas de detalhe passam pelo cache de
+fetch_cache.py: páginas que não mudaram desde o último scraping não são
+processadas de novo, e apenas os livros alterados são extraídos novamente.
+
+O parsing das páginas usa o backend mais rápido disponível em parsers.py e,
+com SCRAPER_PARSE_WORKERS > 0, roda num pool de processos (fora do GIL).
+
+O crawl é um pipeline com filas limitadas (a memória não cresce com a
+quantidade de livros):
+
+    descoberta (categorias e paginação) -> fila de URLs
+    -> workers que baixam e extraem cada livro -> fila de registros
+    -> escrita em lote no checkpoint (checkpoint.py)
+
+Os livros vão para o checkpoint (deduplicados pelo id do produto) em vez de
+ficarem em listas na memória, e um scraping interrompido retoma de onde parou
+(--restart descarta o checkpoint). Ao final o books.csv e o dataset colunar
+(storage.py) são gravados em pedaços a partir do checkpoint, na ordem do site.
+
+Uso: python scraping.py [--base-url URL] [--concurrency N] [--rate-limit R] [--full] [--parse-workers N] [--restart]
+
 autores: Luca Poit, Gabriel Jordan, Marcio Lima, Luciana Ferreira
 '''
 
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
 import time
-import pandas as pd
-import requests
+import httpx
 from bs4 import BeautifulSoup
-import re
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+import parsers
+import storage
+from checkpoint import COLUMNS, CrawlCheckpoint
+from fetch_cache import FetchCache, conditional_headers, content_hash
+
+BASE_URL = os.getenv('SCRAPER_BASE_URL', 'https://books.toscrape.com/')
+
+# Máximo de requisições simultâneas (global)
+CONCURRENCY = int(os.getenv('SCRAPER_CONCURRENCY', 32))
+# Máximo de requisições por segundo para cada host (0 = sem limite)
+RATE_LIMIT = float(os.getenv('SCRAPER_RATE_LIMIT', 0))
+# Novas tentativas por requisição, com espera de BACKOFF * 2^tentativa segundos
+MAX_RETRIES = int(os.getenv('SCRAPER_MAX_RETRIES', 3))
+BACKOFF = float(os.getenv('SCRAPER_BACKOFF', 0.5))
+TIMEOUT = 30.0
+# Scraping incremental com cache por URL (SCRAPER_INCREMENTAL=0 desativa)
+INCREMENTAL = os.getenv('SCRAPER_INCREMENTAL', '1') != '0'
+CACHE_PATH = os.getenv('SCRAPER_CACHE_PATH', 'fetch_cache.db')
+# Processos dedicados ao parsing das páginas de detalhe (0 = threads do próprio processo)
+PARSE_WORKERS = int(os.getenv('SCRAPER_PARSE_WORKERS', 0))
+# Estado do scraping em andamento, para retomar um crawl interrompido
+CHECKPOINT_PATH = os.getenv('SCRAPER_CHECKPOINT_PATH', 'crawl_checkpoint.db')
+# Registros gravados no checkpoint de cada vez
+CHECKPOINT_BATCH = int(os.getenv('SCRAPER_CHECKPOINT_BATCH', 200))
+# Tamanho das filas entre os estágios, em múltiplos da concorrência
+QUEUE_FACTOR = 4
+
+
+# Atualiza o progresso do job (ver jobs.ScrapeJob), quando houver um
+def report(progress, counter, n=1):
+    if progress is not None:
+        progress.incr(counter, n)
 
-BASE_URL = 'https://books.toscrape.com/'
-session = requests.Session()
 
-# Inicializa listas para os dados
-ids, categories, avaiability, image_links, titles, prices, ratings = [], [], [], [], [], [], []
+class HostRateLimiter:
+    '''Espaça as requisições a um mesmo host em pelo menos 1/rate segundos.'''
 
-# Função para extrair links de todas as páginas de categoria e suas páginas seguintes
-def get_all_category_pages():
-    response = session.get(BASE_URL)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    links = soup.find_all('a', href=True)
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next_slot = {}
+
+    async def wait(self, host: str):
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class Crawler:
+    def __init__(self, client: httpx.AsyncClient, base_url: str = BASE_URL, concurrency: int = CONCURRENCY,
+                 rate_limit: float = RATE_LIMIT, retries: int = MAX_RETRIES, backoff: float = BACKOFF,
+                 progress=None, cache: FetchCache | None = None, parse_pool: ProcessPoolExecutor | None = None):
+        self.client = client
+        self.cache = cache
+        self.parse_pool = parse_pool
+        self.base_url = base_url
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.limiter = HostRateLimiter(rate_limit)
+        self.retries = retries
+        self.backoff = backoff
+        self.progress = progress
+
+    async def fetch(self, url: str) -> bytes:
+        return (await self.request(url)).content
+
+    async def parse(self, func, *args):
+        '''Roda o parsing fora do event loop: no pool de processos, se houver, ou numa thread.'''
+        if self.parse_pool is not None:
+            return await asyncio.get_running_loop().run_in_executor(self.parse_pool, func, *args)
+        return await asyncio.to_thread(func, *args)
+
+    async def request(self, url: str, headers: dict | None = None) -> httpx.Response:
+        '''Baixa uma página, tentando de novo em erros de rede, 429 e 5xx.'''
+        host = urlsplit(url).netloc
+        for attempt in range(self.retries + 1):
+            try:
+                await self.limiter.wait(host)
+                async with self.semaphore:
+                    response = await self.client.get(url, headers=headers)
+                if response.status_code != 304:
+                    response.raise_for_status()
+                report(self.progress, 'pages_fetched')
+                return response
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = not isinstance(e, httpx.HTTPStatusError) or \
+                    e.response.status_code == 429 or e.response.status_code >= 500
+                if not retryable or attempt == self.retries:
+                    raise
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+
+# Extrai os links da primeira página de cada categoria a partir da home
+def parse_category_links(html, base_url=BASE_URL):
+    soup = BeautifulSoup(html, 'html.parser')
     category_pages = []
 
-    for link in links:
-        if 'catalogue/category/books/' in link['href']:
-            href = link['href']
+    for link in soup.find_all('a', href=True):
+        href = link['href']
+        if 'catalogue/category/books/' in href:
             if href.startswith('../'):
                 continue  # ignora links duplicados e relativos acima da raiz
-            full_link = BASE_URL + href
+            full_link = base_url + href
             # pula se já foi adicionado
-            if full_link in category_pages:
-                continue
-
-            # agora percorre todas as páginas dessa categoria
-            while True:
+            if full_link not in category_pages:
                 category_pages.append(full_link)
-                category_soup = BeautifulSoup(session.get(full_link).content, 'html.parser')
-                next_page_link = category_soup.find('li', class_="next")
-                if next_page_link:
-                    next_href = next_page_link.find('a')['href']
-                    base = '/'.join(full_link.split('/')[:-1])  # remove a parte do arquivo
-                    full_link = base + '/' + next_href
-                    #print(full_link)
-                else:
-                    break  # fim da paginação da categoria
-
-    return list(set(category_pages))  # remove duplicatas
-
-
-# Função que extrai as URLs de detalhe dos livros em uma página
-def get_books_urls_from_category_page(url):
-    soup = BeautifulSoup(session.get(url).content, 'html.parser')
-    books = soup.find_all(class_="product_pod")
-    urls = []
-    for book in books:
-        id_link = book.find('h3').find('a')['href']
-        id_link = id_link.replace('../../../', '')
-        full_url = BASE_URL + 'catalogue/' + id_link
-        urls.append((full_url, url))  # inclui a URL da categoria para extrair depois
-    return urls
-
-# Função que extrai as informações de um único livro
-def get_book_info(args):
-    url, category_page = args
-    try:
-        id_soup = BeautifulSoup(session.get(url).content, 'html.parser')
 
-        # ID
-        id_table = id_soup.find('table', class_='table table-striped')
-        product_id = id_table.find('tr').find('td').text.strip()
+    return category_pages
 
-        # Título
-        title = id_soup.find('div', class_='col-sm-6 product_main').find('h1').text.strip()
 
-        # Rating
-        tag = id_soup.find('p', class_='star-rating')
-        rating_class = tag.get('class')[1]
-        rating_map = {'One': 1, 'Two': 2, 'Three': 3, 'Four': 4, 'Five': 5}
-        numeric_rating = rating_map.get(rating_class, 0)
+# Extrai as informações de um único livro a partir da sua página de detalhe
+def parse_book_info(html, category_page, base_url=BASE_URL):
+    return parsers.parse_book(html, category_page, base_url)
 
-        # Preço
-        price_tag = id_soup.find('p', class_='price_color').text.strip()
-        price = price_tag.replace('£', '')
 
-        # Estoque
-        stock_text = id_soup.find('p', class_='instock availability').text.strip()
-        match = re.search(r'\((\d+)\s+available\)', stock_text)
-        stock_number = int(match.group(1)) if match else 0
+# Baixa e processa um único livro; erros são registrados e o livro é ignorado.
+# Com cache, páginas inalteradas (304 ou mesmo hash) reaproveitam o registro salvo.
+async def get_book_info(crawler, args):
+    url, category_page = args
+    try:
+        cached = crawler.cache.get(url) if crawler.cache else None
+        response = await crawler.request(url, conditional_headers(cached))
 
-        # Imagem
-        image_tag = id_soup.find('img')['src']
-        image_url = BASE_URL + image_tag.replace('../../', '')
+        digest = None
+        if cached and response.status_code != 304:
+            digest = content_hash(response.content)
+        if cached and (response.status_code == 304 or digest == cached['content_hash']):
+            report(crawler.progress, 'unchanged')
+            return cached['record']
 
-        # Categoria
-        category = category_page.split('/')[-2].split('_')[0]
+        # o parsing roda fora do event loop para não atrasar os downloads
+        result = await crawler.parse(parsers.parse_book, response.content, category_page, crawler.base_url)
+        report(crawler.progress, 'books_parsed')
 
-        return (product_id, title, category, price, numeric_rating, stock_number, image_url)
+        if crawler.cache:
+            crawler.cache.put(url, response.headers.get('etag'), response.headers.get('last-modified'),
+                              digest or content_hash(response.content), result)
+        return result
 
     except Exception as e:
         print(f"Erro ao processar {url}: {e}")
+        report(crawler.progress, 'errors')
         return None
 
-def run() -> float:
+
+# Percorre a paginação de uma categoria, enfileirando os livros de cada página
+# assim que ela é lida (a fila cheia segura a descoberta até os workers a esvaziarem)
+async def crawl_category(crawler, url, category_order, urls, checkpoint):
+    visited, book_order = set(), 0
+    while url and url not in visited:
+        visited.add(url)
+        html = await crawler.fetch(url)
+        book_urls, next_url = await crawler.parse(parsers.parse_category_page, html, url, crawler.base_url)
+        for book_url, category_page in book_urls:
+            # livros já gravados no checkpoint (crawl retomado) não são baixados de novo
+            if not checkpoint.is_done(book_url):
+                await urls.put((book_url, category_page, (category_order, book_order)))
+            book_order += 1
+        url = next_url
+
+
+# Baixa e extrai os livros da fila de URLs até receber None
+async def book_worker(crawler, urls, records):
+    while True:
+        item = await urls.get()
+        if item is None:
+            return
+        book_url, category_page, order = item
+        record = await get_book_info(crawler, (book_url, category_page))
+        if record:
+            await records.put((book_url, order, record))
+
+
+# Grava os registros no checkpoint em lotes até receber None
+async def checkpoint_writer(records, checkpoint, cache):
+    batch = []
+    try:
+        while True:
+            item = await records.get()
+            if item is None:
+                break
+            batch.append(item)
+            if len(batch) >= CHECKPOINT_BATCH:
+                await asyncio.to_thread(checkpoint.add, batch)
+                batch = []
+                if cache:
+                    cache.commit()
+    finally:
+        # também em caso de erro/cancelamento: o que já foi extraído não se perde
+        if batch:
+            checkpoint.add(batch)
+        if cache:
+            cache.commit()
+
+
+# Coleta todas as páginas de categoria e, em paralelo, a paginação de cada uma;
+# depois encerra os workers e, quando eles terminam, o writer
+async def discover(crawler, urls, records, workers, checkpoint):
+    home = await crawler.fetch(crawler.base_url)
+    category_pages = parse_category_links(home, crawler.base_url)
+    await asyncio.gather(*(crawl_category(crawler, page, order, urls, checkpoint)
+                           for order, page in enumerate(category_pages)))
+    for _ in workers:
+        await urls.put(None)
+    await asyncio.gather(*workers)
+    await records.put(None)
+
+
+async def crawl(checkpoint, base_url=BASE_URL, concurrency=CONCURRENCY, rate_limit=RATE_LIMIT, progress=None,
+                cache=None, parse_pool=None):
+    base_url = base_url if base_url.endswith('/') else base_url + '/'
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    urls = asyncio.Queue(maxsize=concurrency * QUEUE_FACTOR)
+    records = asyncio.Queue(maxsize=concurrency * QUEUE_FACTOR)
+
+    async with httpx.AsyncClient(timeout=TIMEOUT, limits=limits, follow_redirects=True) as client:
+        crawler = Crawler(client, base_url, concurrency, rate_limit, progress=progress, cache=cache,
+                          parse_pool=parse_pool)
+        writer = asyncio.create_task(checkpoint_writer(records, checkpoint, cache))
+        workers = [asyncio.create_task(book_worker(crawler, urls, records)) for _ in range(concurrency)]
+        discovery = asyncio.create_task(discover(crawler, urls, records, workers, checkpoint))
+        tasks = [discovery, *workers, writer]
+        try:
+            # as etapas são supervisionadas juntas: se qualquer uma falhar (ex: o
+            # checkpoint não grava), as outras são canceladas em vez de ficarem
+            # presas nas filas cheias
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Grava o CSV (em pedaços) num arquivo temporário do mesmo diretório e o troca
+# com os.replace, que é atômico: quem lê o books.csv nunca vê um arquivo pela metade
+def export_csv(chunks, path='books.csv'):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.books-', suffix='.csv.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+            header = True
+            for chunk in chunks:
+                chunk.to_csv(f, index=False, header=header)
+                header = False
+            if header:  # nenhum livro: só o cabeçalho
+                f.write(','.join(COLUMNS) + '\n')
+        os.chmod(tmp_path, 0o644)  # mkstemp cria o arquivo só com permissão do dono
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def run(progress=None, base_url=BASE_URL, concurrency=CONCURRENCY, rate_limit=RATE_LIMIT,
+        incremental=INCREMENTAL, cache_path=CACHE_PATH, parse_workers=PARSE_WORKERS,
+        checkpoint_path=CHECKPOINT_PATH, resume=True) -> float:
     print('\n\nIniciando Scrapping...')
     start_time = time.time()
 
-    # Coleta todas as páginas de categoria
-    category_pages = get_all_category_pages()
-
-    # Coleta todas as URLs de livros
-    all_book_urls = []
-    for category_page in category_pages:
-        all_book_urls += get_books_urls_from_category_page(category_page)
-
-    # Usa paralelismo para coletar dados de cada livro
-    with ThreadPoolExecutor(max_workers=16) as executor:
-        results = list(executor.map(get_book_info, all_book_urls))
-
-    # Filtra resultados válidos
-    for result in results:
-        if result:
-            product_id, title, category, price, numeric_rating, stock_number, image_url = result
-            ids.append(product_id)
-            titles.append(title)
-            categories.append(category)
-            prices.append(price)
-            ratings.append(numeric_rating)
-            avaiability.append(stock_number)
-            image_links.append(image_url)
-
-    # Gera o DataFrame
-    books_df = pd.DataFrame({
-        'id': ids,
-        'title': titles,
-        'category': categories,
-        'price': prices,
-        'rating': ratings,
-        'availability': avaiability,
-        'image_links': image_links
-    })
-
-    # Exporta CSV
-    books_df.to_csv('books.csv', index=False)
-    
+    checkpoint = CrawlCheckpoint(checkpoint_path, base_url, resume)
+    if checkpoint.resumed:
+        print(f'Retomando o scraping interrompido: {checkpoint.resumed} livros já extraídos')
+    cache = FetchCache(cache_path) if incremental else None
+    # spawn: o scraping pode rodar numa thread da API, onde fork não é seguro
+    parse_pool = ProcessPoolExecutor(parse_workers, mp_context=multiprocessing.get_context('spawn')) \
+        if parse_workers > 0 else None
+    try:
+        asyncio.run(crawl(checkpoint, base_url, concurrency, rate_limit, progress, cache, parse_pool))
+
+        # Exporta CSV e publica a nova versão no formato colunar lido pela API
+        export_csv(checkpoint.iter_frames(), 'books.csv')
+        # o dataset é montado em pedaços a partir do checkpoint, sem reler o CSV inteiro
+        storage.write_frames(checkpoint.iter_frames(), os.getenv('BOOKS_DATA_DIR', storage.STORAGE_ROOT))
+    except BaseException:
+        checkpoint.close()  # mantém o checkpoint para retomar
+        raise
+    else:
+        checkpoint.remove()
+    finally:
+        if cache:
+            cache.close()
+        if parse_pool:
+            parse_pool.shutdown()
+
     duration = time.time() - start_time
     print(f'Tempo total de execução: {duration:.2f} segundos\n')
     return duration
 
 
 if __name__ == '__main__':
-    run()
+    parser = argparse.ArgumentParser(description='Scraping do books.toscrape.com')
+    parser.add_argument('--base-url', default=BASE_URL, help='Raiz do site (ex: servidor local de fixtures)')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--rate-limit', type=float, default=RATE_LIMIT)
+    parser.add_argument('--full', action='store_true', help='Ignora o cache e processa todas as páginas')
+    parser.add_argument('--parse-workers', type=int, default=PARSE_WORKERS)
+    parser.add_argument('--restart', action='store_true', help='Descarta o checkpoint de um scraping interrompido')
+    args = parser.parse_args()
+    run(base_url=args.base_url, concurrency=args.concurrency, rate_limit=args.rate_limit,
+        incremental=INCREMENTAL and not args.full, parse_workers=args.parse_workers, resume=not args.restart)
@@ -0,0 +1,183 @@
+'''
+Esse módulo implementa a busca textual por título dos livros.
+
+O índice é montado a partir do catálogo a cada versão do dataset:
+
+    -índice invertido: token -> ids dos livros que têm o token no título
+    -vocabulário ordenado, para achar tokens por prefixo com bisect
+    -índice de trigramas dos tokens, para tolerar erros de digitação
+
+Cada token da busca casa de forma exata, por prefixo (o usuário ainda está
+digitando) ou aproximada (trigramas), com pesos decrescentes. Os livros são
+ordenados pela quantidade de tokens encontrados e pela soma dos pesos, com
+bônus para títulos iguais ou que começam com o texto buscado.
+
+Quando só parte dos livros muda entre versões, o índice novo é derivado do
+anterior aplicando apenas as diferenças (os conjuntos alterados são copiados,
+então o índice da versão antiga continua válido para quem ainda o usa).
+'''
+
+import bisect
+import heapq
+import re
+import unicodedata
+
+from records import BookRecord
+
+TOKEN_RE = re.compile(r'\w+')
+
+EXACT_WEIGHT = 1.0
+PREFIX_WEIGHT = 0.7
+FUZZY_WEIGHT = 0.5
+# similaridade mínima (Jaccard de trigramas) para um token ser considerado aproximado
+FUZZY_THRESHOLD = 0.4
+# máximo de tokens do vocabulário expandidos por um prefixo ou por trigramas
+MAX_EXPANSIONS = 50
+
+
+def fold(text) -> str:
+    '''Minúsculo e sem acentos.'''
+    if not isinstance(text, str):
+        return ''
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in text if not unicodedata.combining(char)).lower().strip()
+
+
+def tokenize(text) -> list[str]:
+    return TOKEN_RE.findall(fold(text))
+
+
+def trigrams(token: str) -> set[str]:
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    def __init__(self, records=()):
+        self.docs = {}        # id -> (tokens do título em ordem, categoria normalizada, tokens únicos)
+        self.postings = {}    # token -> set(ids)
+        self.vocabulary = []  # tokens ordenados
+        self.grams = {}       # trigrama -> set(tokens)
+        self._owned = set()   # conjuntos já copiados nesta instância (copy-on-write)
+        for record in records:
+            self.add(record, keep_sorted=False)
+        self.vocabulary.sort()
+        self._owned = set()
+
+    def add(self, record: BookRecord, keep_sorted: bool = True):
+        book_id = record.id
+        if book_id in self.docs:
+            return  # ids repetidos: vale a primeira ocorrência, como no catálogo
+        title_tokens = tokenize(record.title)
+        tokens = tuple(dict.fromkeys(title_tokens))
+        self.docs[book_id] = (' '.join(title_tokens), fold(record.category), tokens)
+        for token in tokens:
+            if token not in self.postings:
+                self.postings[token] = set()
+                self._owned.add(('p', token))
+                if keep_sorted:
+                    bisect.insort(self.vocabulary, token)
+                else:
+                    self.vocabulary.append(token)  # carga inicial: ordenado uma vez no final
+                for gram in trigrams(token):
+                    self._writable_gram(gram).add(token)
+            self._writable_posting(token).add(book_id)
+
+    def remove(self, record: BookRecord):
+        book_id = record.id
+        doc = self.docs.pop(book_id, None)
+        if doc is None:
+            return
+        for token in doc[2]:
+            posting = self._writable_posting(token)
+            posting.discard(book_id)
+            if not posting:
+                del self.postings[token]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+                for gram in trigrams(token):
+                    tokens = self._writable_gram(gram)
+                    tokens.discard(token)
+                    if not tokens:
+                        del self.grams[gram]
+                        self._owned.discard(('g', gram))  # um novo token com o trigrama recria o conjunto
+
+    def _writable_posting(self, token: str) -> set:
+        if ('p', token) not in self._owned:
+            self.postings[token] = set(self.postings[token])
+            self._owned.add(('p', token))
+        return self.postings[token]
+
+    def _writable_gram(self, gram: str) -> set:
+        if ('g', gram) not in self._owned:
+            self.grams[gram] = set(self.grams.get(gram, ()))
+            self._owned.add(('g', gram))
+        return self.grams[gram]
+
+    def updated(self, removed: list[BookRecord], added: list[BookRecord]) -> 'SearchIndex':
+        '''Novo índice com as mudanças aplicadas; este (de outro snapshot) não é alterado.'''
+        new = SearchIndex.__new__(SearchIndex)
+        new.docs = dict(self.docs)
+        new.postings = dict(self.postings)
+        new.vocabulary = list(self.vocabulary)
+        new.grams = dict(self.grams)
+        new._owned = set()
+        for record in removed:
+            new.remove(record)
+        for record in added:
+            new.add(record)
+        new._owned = set()
+        return new
+
+    def expand(self, token: str) -> dict[str, float]:
+        '''Tokens do vocabulário que casam com o token buscado, com o peso de cada um.'''
+        matches = {}
+        start = bisect.bisect_left(self.vocabulary, token)
+        for candidate in self.vocabulary[start:start + MAX_EXPANSIONS]:
+            if not candidate.startswith(token):
+                break
+            matches[candidate] = EXACT_WEIGHT if candidate == token else PREFIX_WEIGHT
+
+        if not matches and len(token) >= 3:
+            query_grams = trigrams(token)
+            shared = {}
+            for gram in query_grams:
+                for candidate in self.grams.get(gram, ()):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+            best = heapq.nlargest(MAX_EXPANSIONS, shared.items(), key=lambda item: item[1])
+            for candidate, count in best:
+                similarity = count / (len(query_grams) + len(trigrams(candidate)) - count)
+                if similarity >= FUZZY_THRESHOLD:
+                    matches[candidate] = FUZZY_WEIGHT * similarity
+        return matches
+
+    def search(self, query: str, category: str | None = None, limit: int = 10) -> list[str]:
+        '''Ids dos livros mais relevantes para a busca, do mais para o menos relevante.'''
+        folded_query = ' '.join(tokenize(query))
+        query_tokens = list(dict.fromkeys(folded_query.split()))
+        if not query_tokens:
+            return []
+        wanted_category = fold(category) if category else None
+
+        matched, scores = {}, {}
+        for token in query_tokens:
+            best = {}
+            for candidate, weight in self.expand(token).items():
+                for book_id in self.postings[candidate]:
+                    if weight > best.get(book_id, 0):
+                        best[book_id] = weight
+            for book_id, weight in best.items():
+                matched[book_id] = matched.get(book_id, 0) + 1
+                scores[book_id] = scores.get(book_id, 0) + weight
+
+        ranked = []
+        for book_id, score in scores.items():
+            title, book_category, _ = self.docs[book_id]
+            if wanted_category is not None and book_category != wanted_category:
+                continue
+            if title == folded_query:
+                score += 2
+            elif title.startswith(folded_query):
+                score += 1
+            ranked.append((matched[book_id], score, book_id))
+
+        return [book_id for _, _, book_id in heapq.nlargest(limit, ranked)]
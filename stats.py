@@ -0,0 +1,169 @@
+'''
+Esse módulo calcula as estatísticas da coleção e de cada categoria uma única
+vez por versão do dataset:
+
+    -quantidade de livros
+    -preço médio, mínimo, máximo e percentis
+    -histograma de ratings
+    -estoque total e livros em estoque
+
+Os agregados podem ser atualizados de forma incremental: quando só alguns
+livros mudam entre duas versões, apenas os livros removidos/adicionados são
+processados, em vez de recalcular tudo.
+'''
+
+import bisect
+import math
+
+from records import BookRecord
+
+PERCENTILES = (25, 50, 75, 90)
+
+
+def percentile(sorted_values: list[float], q: float) -> float | None:
+    '''Percentil com interpolação linear (mesmo critério do numpy/pandas).'''
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float)) and value == value  # ignora NaN
+
+
+def category_of(record: BookRecord) -> str | None:
+    category = record.category
+    return category if isinstance(category, str) else None
+
+
+class GroupStats:
+    '''Agregados de um grupo de livros (a coleção inteira ou uma categoria).'''
+
+    def __init__(self):
+        self.count = 0
+        self.prices = []  # mantida ordenada: mínimo, máximo e percentis saem em O(1)
+        self.ratings = {}
+        self.stock_total = 0
+        self.in_stock = 0
+        self._summary = None
+
+    def copy(self) -> 'GroupStats':
+        other = GroupStats()
+        other.count = self.count
+        other.prices = list(self.prices)
+        other.ratings = dict(self.ratings)
+        other.stock_total = self.stock_total
+        other.in_stock = self.in_stock
+        return other
+
+    def add(self, record: BookRecord, keep_sorted: bool = True):
+        self._summary = None
+        self.count += 1
+        price = record.price
+        if is_number(price):
+            if keep_sorted:
+                bisect.insort(self.prices, price)
+            else:
+                self.prices.append(price)  # carga inicial: ordenada uma vez no final
+        rating = record.rating
+        if is_number(rating):
+            self.ratings[int(rating)] = self.ratings.get(int(rating), 0) + 1
+        stock = record.availability
+        if is_number(stock):
+            self.stock_total += int(stock)
+            self.in_stock += stock > 0
+
+    def remove(self, record: BookRecord):
+        self._summary = None
+        self.count -= 1
+        price = record.price
+        if is_number(price):
+            del self.prices[bisect.bisect_left(self.prices, price)]
+        rating = record.rating
+        if is_number(rating):
+            self.ratings[int(rating)] -= 1
+            if not self.ratings[int(rating)]:
+                del self.ratings[int(rating)]
+        stock = record.availability
+        if is_number(stock):
+            self.stock_total -= int(stock)
+            self.in_stock -= stock > 0
+
+    def to_dict(self) -> dict:
+        # grupos que não mudaram entre versões reaproveitam o resumo já calculado
+        if self._summary is None:
+            self._summary = self.summarize()
+        return self._summary
+
+    def summarize(self) -> dict:
+        mean = math.fsum(self.prices) / len(self.prices) if self.prices else None
+        return {
+            "total de livros": self.count,
+            "preço médio": mean,
+            "preço mínimo": self.prices[0] if self.prices else None,
+            "preço máximo": self.prices[-1] if self.prices else None,
+            "percentis de preço": {f"p{q}": percentile(self.prices, q) for q in PERCENTILES},
+            "ratings": dict(sorted(self.ratings.items())),
+            "estoque total": self.stock_total,
+            "livros em estoque": self.in_stock,
+        }
+
+
+class CatalogStats:
+    def __init__(self, records=()):
+        self.overall = GroupStats()
+        self.by_category = {}
+        for record in records:
+            self.add(record, keep_sorted=False)
+        for group in [self.overall, *self.by_category.values()]:
+            group.prices.sort()
+        self.freeze()
+
+    def add(self, record: BookRecord, keep_sorted: bool = True):
+        self.overall.add(record, keep_sorted)
+        category = category_of(record)
+        if category is None:
+            return
+        if category not in self.by_category:
+            self.by_category[category] = GroupStats()
+        self.by_category[category].add(record, keep_sorted)
+
+    def remove(self, record: BookRecord):
+        self.overall.remove(record)
+        category = category_of(record)
+        if category is None:
+            return
+        self.by_category[category].remove(record)
+        if not self.by_category[category].count:
+            del self.by_category[category]
+
+    def updated(self, removed: list[BookRecord], added: list[BookRecord]) -> 'CatalogStats':
+        '''Nova instância com as mudanças aplicadas; a atual (de outro snapshot) não é alterada.'''
+        new = CatalogStats.__new__(CatalogStats)
+        new.overall = self.overall.copy()
+        new.by_category = dict(self.by_category)
+        # só as categorias afetadas são copiadas antes de serem alteradas
+        for category in {category_of(record) for record in removed + added}:
+            if category in new.by_category:
+                new.by_category[category] = new.by_category[category].copy()
+
+        for record in removed:
+            new.remove(record)
+        for record in added:
+            new.add(record)
+        new.freeze()
+        return new
+
+    def freeze(self):
+        '''Gera uma vez as respostas servidas pela API.'''
+        self._overview = self.overall.to_dict()
+        self._categories = {category: group.to_dict() for category, group in sorted(self.by_category.items())}
+
+    def overview(self) -> dict:
+        return self._overview
+
+    def categories(self) -> dict:
+        return self._categories
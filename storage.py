@@ -0,0 +1,229 @@
+'''
+Esse módulo grava e lê o dataset de livros num formato colunar binário, com
+schema explícito, no lugar de passar por read_csv / to_csv:
+
+    -price: float64
+    -rating: int8
+    -availability: int32
+    -category: categórica (códigos int16 + lista de categorias)
+    -id, title, image_links: texto UTF-8 (bytes concatenados + offsets)
+
+Cada versão fica num diretório próprio (data/books-<versão>/) com um arquivo
+.npy por coluna numérica, e o arquivo data/CURRENT aponta para a versão atual.
+A troca de versão é atômica (os.replace no CURRENT). As colunas numéricas são
+carregadas com memory-map, então vários workers do uvicorn compartilham o
+page cache em vez de cada um manter sua própria cópia.
+
+O books.csv continua sendo gerado como exportação.
+
+Uso: python storage.py [books.csv] [data]
+    converte um CSV existente para o formato colunar
+'''
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+STORAGE_ROOT = 'data'
+CURRENT_FILE = 'CURRENT'
+FORMAT_VERSION = 1
+# versões antigas mantidas no disco (leitores em andamento ainda podem usá-las)
+KEEP_VERSIONS = 2
+
+SCHEMA = {
+    'id': 'string',
+    'title': 'string',
+    'category': 'category',
+    'price': 'float64',
+    'rating': 'int8',
+    'availability': 'int32',
+    'image_links': 'string',
+}
+
+
+def coerce_schema(df: pd.DataFrame) -> pd.DataFrame:
+    '''Converte as colunas para os tipos do SCHEMA (ex: o preço vem do scraping como texto).'''
+    out = {}
+    for column, dtype in SCHEMA.items():
+        values = df[column]
+        if dtype == 'string':
+            out[column] = values.fillna('').astype(str)
+        elif dtype == 'category':
+            out[column] = values.fillna('').astype(str).astype('category')
+        elif dtype == 'float64':
+            out[column] = pd.to_numeric(values, errors='coerce').astype('float64')
+        else:
+            out[column] = pd.to_numeric(values, errors='coerce').fillna(0).astype(dtype)
+    return pd.DataFrame(out)
+
+
+def dataset_version(df: pd.DataFrame) -> str:
+    return hashlib.sha1(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()[:16]
+
+
+def current_path(root: str = STORAGE_ROOT) -> str:
+    return os.path.join(root, CURRENT_FILE)
+
+
+def has_dataset(root: str = STORAGE_ROOT) -> bool:
+    return os.path.exists(current_path(root))
+
+
+class StringWriter:
+    '''Grava uma coluna de texto em pedaços: bytes concatenados no .bin e offsets acumulados.'''
+
+    def __init__(self, directory: str, column: str):
+        self.directory = directory
+        self.column = column
+        self.file = open(os.path.join(directory, f'{column}.bin'), 'wb')
+        self.offsets = [np.zeros(1, dtype=np.int64)]
+        self.size = 0
+
+    def write(self, values: pd.Series):
+        encoded = [value.encode('utf-8') for value in values]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        self.offsets.append(self.size + np.cumsum(lengths))
+        self.size += int(lengths.sum())
+        self.file.write(b''.join(encoded))
+
+    def close(self):
+        self.file.close()
+        np.save(os.path.join(self.directory, f'{self.column}.offsets.npy'), np.concatenate(self.offsets))
+
+
+def read_strings(directory: str, column: str) -> list[str]:
+    offsets = np.load(os.path.join(directory, f'{column}.offsets.npy'))
+    with open(os.path.join(directory, f'{column}.bin'), 'rb') as f:
+        data = f.read()
+    bounds = offsets.tolist()
+    return [data[start:end].decode('utf-8') for start, end in zip(bounds, bounds[1:])]
+
+
+def write_dataset(df: pd.DataFrame, root: str = STORAGE_ROOT) -> str:
+    '''Grava uma nova versão e a publica no CURRENT; retorna a versão.'''
+    return write_frames([df], root)
+
+
+def write_frames(frames, root: str = STORAGE_ROOT) -> str:
+    '''
+    Como write_dataset, mas a partir de DataFrames em pedaços (ex: lidos do
+    checkpoint do scraping), sem juntar o dataset inteiro em memória: os textos
+    vão direto para o disco e só as colunas numéricas e os códigos das
+    categorias ficam em memória até o fim. A versão é a mesma que o
+    dataset_version do DataFrame completo.
+    '''
+    os.makedirs(root, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix='.books-', dir=root)
+    try:
+        digest = hashlib.sha1()
+        rows = 0
+        strings = {column: StringWriter(tmp_dir, column) for column, dtype in SCHEMA.items() if dtype == 'string'}
+        numbers = {column: [] for column, dtype in SCHEMA.items() if dtype not in ('string', 'category')}
+        # categorias na ordem em que aparecem; os códigos são renumerados em ordem alfabética no fim
+        seen = {column: {} for column, dtype in SCHEMA.items() if dtype == 'category'}
+        codes = {column: [] for column in seen}
+        try:
+            for frame in frames:
+                frame = coerce_schema(frame)
+                # o hash por linha não depende da divisão em pedaços
+                digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+                rows += len(frame)
+                for column, writer in strings.items():
+                    writer.write(frame[column])
+                for column, chunks in numbers.items():
+                    chunks.append(frame[column].to_numpy())
+                for column, known in seen.items():
+                    values = frame[column].cat
+                    mapping = np.array([known.setdefault(value, len(known)) for value in values.categories],
+                                       dtype=np.int32)
+                    codes[column].append(mapping[values.codes.to_numpy()])
+        finally:
+            for writer in strings.values():
+                writer.close()
+
+        for column, chunks in numbers.items():
+            values = np.concatenate(chunks) if chunks else np.array([], dtype=SCHEMA[column])
+            np.save(os.path.join(tmp_dir, f'{column}.npy'), values)
+        categories = {}
+        for column, known in seen.items():
+            categories[column] = sorted(known)
+            renumber = np.empty(len(known), dtype=np.int16)
+            for code, value in enumerate(categories[column]):
+                renumber[known[value]] = code
+            merged = np.concatenate(codes[column]) if codes[column] else np.array([], dtype=np.int32)
+            np.save(os.path.join(tmp_dir, f'{column}.codes.npy'), renumber[merged])
+
+        version = digest.hexdigest()[:16]
+        meta = {
+            'format': FORMAT_VERSION,
+            'version': version,
+            'rows': rows,
+            'schema': SCHEMA,
+            'categories': categories,
+        }
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.chmod(tmp_dir, 0o755)
+        name = f'books-{version}'
+        target = os.path.join(root, name)
+        if os.path.isdir(target):
+            shutil.rmtree(tmp_dir)  # versão já gravada antes
+        else:
+            os.rename(tmp_dir, target)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    # publica a versão trocando o ponteiro de forma atômica
+    fd, tmp_current = tempfile.mkstemp(prefix='.CURRENT-', dir=root)
+    with os.fdopen(fd, 'w') as f:
+        f.write(name)
+    os.chmod(tmp_current, 0o644)
+    os.replace(tmp_current, current_path(root))
+
+    prune_versions(root, keep=name)
+    return version
+
+
+def prune_versions(root: str, keep: str):
+    '''Remove as versões mais antigas, mantendo KEEP_VERSIONS (incluindo a atual).'''
+    older = [entry for entry in os.scandir(root)
+             if entry.is_dir() and entry.name.startswith('books-') and entry.name != keep]
+    older.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in older[KEEP_VERSIONS - 1:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def load_dataset(root: str = STORAGE_ROOT, mmap: bool = True) -> tuple[pd.DataFrame, str]:
+    '''Carrega a versão atual; retorna (DataFrame, versão).'''
+    with open(current_path(root)) as f:
+        directory = os.path.join(root, f.read().strip())
+    with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+
+    mmap_mode = 'r' if mmap else None
+    columns = {}
+    for column, dtype in meta['schema'].items():
+        if dtype == 'string':
+            columns[column] = read_strings(directory, column)
+        elif dtype == 'category':
+            codes = np.load(os.path.join(directory, f'{column}.codes.npy'), mmap_mode=mmap_mode)
+            columns[column] = pd.Categorical.from_codes(codes, meta['categories'][column])
+        else:
+            columns[column] = np.load(os.path.join(directory, f'{column}.npy'), mmap_mode=mmap_mode)
+
+    # copy=False mantém as colunas numéricas apontando para o memory-map
+    return pd.DataFrame(columns, copy=False), meta['version']
+
+
+if __name__ == '__main__':
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else 'books.csv'
+    root = sys.argv[2] if len(sys.argv) > 2 else STORAGE_ROOT
+    version = write_dataset(pd.read_csv(csv_path), root)
+    print(f'{csv_path} convertido para {root}/books-{version}')
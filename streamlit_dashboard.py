@@ -1,25 +1,74 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from datetime import datetime, timedelta, timezone
 import os
+import httpx
 
 # Set up DB connection
 DATABASE_URL = os.getenv("DATABASE_URL")  # set this in Streamlit cloud or .env locally
 engine = create_engine(DATABASE_URL)
 
-# Load log data
+# Janelas de tempo disponíveis no dashboard
+WINDOWS = {
+    "Últimos 15 minutos": timedelta(minutes=15),
+    "Última hora": timedelta(hours=1),
+    "Últimas 24 horas": timedelta(hours=24),
+    "Últimos 7 dias": timedelta(days=7),
+    "Últimos 30 dias": timedelta(days=30),
+}
+
+# Load aggregated log data: as consultas leem só os agregados por minuto
+# (logs_per_minute, mantidos pelo LogWriter), nunca a tabela de logs inteira
 @st.cache_data(ttl=10)  # refresh every 10 seconds (or manually)
-def load_logs():
+def load_rollups(since: datetime) -> pd.DataFrame:
+    with engine.begin() as conn:
+        df = pd.read_sql(
+            text("""
+                SELECT endpoint, status_code, SUM(requests) AS requests
+                FROM logs_per_minute
+                WHERE bucket >= :since
+                GROUP BY endpoint, status_code
+            """),
+            conn, params={"since": since},
+        )
+    return df
+
+@st.cache_data(ttl=10)
+def load_timeline(since: datetime) -> pd.DataFrame:
+    with engine.begin() as conn:
+        df = pd.read_sql(
+            text("""
+                SELECT bucket, SUM(requests) AS requests
+                FROM logs_per_minute
+                WHERE bucket >= :since
+                GROUP BY bucket
+                ORDER BY bucket
+            """),
+            conn, params={"since": since}, parse_dates=["bucket"],
+        )
+    return df
+
+@st.cache_data(ttl=10)
+def load_recent_logs(limit: int = 100) -> pd.DataFrame:
     with engine.begin() as conn:
-        df = pd.read_sql("SELECT * FROM logs ORDER BY timestamp DESC", conn)
+        df = pd.read_sql(
+            text("SELECT * FROM logs ORDER BY timestamp DESC LIMIT :limit"),
+            conn, params={"limit": limit}, parse_dates=["timestamp"],
+        )
     return df
 
 # App layout
 st.set_page_config(page_title="API Log Dashboard", layout="wide")
 st.title("📊 API Log Dashboard")
 
-df = load_logs()
+window = st.selectbox("🗓️ Janela de tempo", list(WINDOWS), index=2)
+# os agregados são gravados em UTC, com o início de cada minuto
+since = (datetime.now(timezone.utc) - WINDOWS[window]).replace(tzinfo=None, second=0, microsecond=0)
+
+df = load_rollups(since)
+recent = load_recent_logs()
 
 if df.empty:
     st.warning("No logs found.")
@@ -29,15 +78,16 @@ if df.empty:
 col1, col2 = st.columns(2)
 
 with col1:
-    st.metric("🔢 Total Calls", max(df['id']))
+    st.metric("🔢 Total Calls", int(df['requests'].sum()))
 
 with col2:
-    last = df.iloc[0]
-    st.metric(
-        label="🕒 Last Call",
-        value=f"{last['endpoint']} → {last['status_code']}",
-        delta=last['timestamp'].strftime("%Y-%m-%d %H:%M:%S")
-    )
+    if not recent.empty:
+        last = recent.iloc[0]
+        st.metric(
+            label="🕒 Last Call",
+            value=f"{last['endpoint']} → {last['status_code']}",
+            delta=last['timestamp'].strftime("%Y-%m-%d %H:%M:%S")
+        )
 
 st.divider()
 
@@ -45,13 +95,42 @@ st.divider()
 col1, col2 = st.columns(2)
 
 with col1:
-    fig1 = px.pie(df, names='endpoint', title='📌 Calls by Endpoint')
+    fig1 = px.pie(df, names='endpoint', values='requests', title='📌 Calls by Endpoint')
     st.plotly_chart(fig1, use_container_width=True)
 
 with col2:
-    fig2 = px.pie(df, names='status_code', title='✅ Status Code Distribution')
+    fig2 = px.pie(df, names='status_code', values='requests', title='✅ Status Code Distribution')
     st.plotly_chart(fig2, use_container_width=True)
 
+timeline = load_timeline(since)
+if WINDOWS[window] > timedelta(days=1):
+    # janelas longas: uma barra por hora em vez de uma por minuto
+    timeline = timeline.set_index('bucket').resample('1h').sum().reset_index()
+fig_timeline = px.bar(timeline, x='bucket', y='requests', title='📈 Calls over Time (UTC)')
+st.plotly_chart(fig_timeline, use_container_width=True)
+
+# --- Latency Section (lida do /api/v1/metrics/summary da API, se configurado) ---
+METRICS_URL = os.getenv("METRICS_URL")  # ex: http://localhost:8000/api/v1/metrics/summary
+
+@st.cache_data(ttl=10)
+def load_metrics_summary():
+    response = httpx.get(METRICS_URL, timeout=5)
+    response.raise_for_status()
+    return pd.DataFrame(response.json())
+
+if METRICS_URL:
+    st.divider()
+    st.subheader("⏱️ Latência por rota")
+    try:
+        summary = load_metrics_summary()
+        summary = summary[summary['requisições'].notna()]
+        st.dataframe(summary, use_container_width=True)
+        fig3 = px.bar(summary, x='rota', y=['p50 (ms)', 'p90 (ms)', 'p99 (ms)'], barmode='group',
+                      title='🐢 Percentis de latência por rota')
+        st.plotly_chart(fig3, use_container_width=True)
+    except Exception as e:
+        st.warning(f"Não foi possível ler as métricas da API: {e}")
+
 # --- Optional Table Section ---
-with st.expander("📄 Show Raw Log Table"):
-    st.dataframe(df, use_container_width=True)
+with st.expander("📄 Show Raw Log Table (últimas 100 requisições)"):
+    st.dataframe(recent, use_container_width=True)
@@ -0,0 +1,85 @@
+import os
+import sys
+
+# os módulos da API ficam na raiz do repositório
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# lidas no import do api.py/auth_utils.py
+os.environ.setdefault('SECRET_KEY', 'test')
+os.environ.setdefault('MODEL_PATH', os.path.join(ROOT, 'model.json'))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+WORDS = ['light', 'shadow', 'river', 'night', 'garden', 'secret', 'city', 'winter', 'house',
+         'ocean', 'story', 'fire', 'glass', 'mountain', 'dream', 'king', 'stone', 'song', 'café']
+
+
+def random_catalog(rng, n: int, start: int = 0) -> pd.DataFrame:
+    '''Livros sintéticos no schema do books.csv, com alguns preços ausentes.'''
+    prices = rng.uniform(10, 60, n).round(2)
+    prices[rng.random(n) < 0.02] = np.nan
+    return pd.DataFrame({
+        'id': [f'{i:016x}' for i in range(start, start + n)],
+        'title': [' '.join(rng.choice(WORDS, rng.integers(1, 5))).title() for _ in range(n)],
+        # a 'Category 0' é rara, para poder sumir numa versão nova
+        'category': rng.choice([f'Category {i}' for i in range(12)], n, p=[0.01] + [0.09] * 11),
+        'price': prices,
+        'rating': rng.integers(1, 6, n),
+        'availability': rng.integers(0, 23, n),
+        'image_links': [f'https://books.toscrape.com/media/cache/{i:08x}.jpg' for i in range(start, start + n)],
+    })
+
+
+def random_change(rng, frame: pd.DataFrame) -> pd.DataFrame:
+    '''Nova versão do catálogo: remove, altera e adiciona alguns livros (e categorias).'''
+    n = len(frame)
+    frame = frame.drop(index=rng.choice(n, n // 40, replace=False)).reset_index(drop=True)
+    changed = rng.choice(len(frame), n // 40, replace=False)
+    new = random_catalog(rng, len(changed))
+    for column in ('title', 'category', 'price', 'rating', 'availability'):
+        frame.loc[changed, column] = new[column].to_numpy()
+    # uma categoria nova e uma que deixa de existir
+    frame.loc[changed[:3], 'category'] = 'New Category'
+    frame.loc[frame['category'] == 'Category 0', 'category'] = 'Category 1'
+    added = random_catalog(rng, n // 40, start=10 * n)
+    return pd.concat([frame, added], ignore_index=True)
+
+
+@pytest.fixture
+def catalog_versions():
+    '''Pares (versão antiga, versão nova) de catálogos aleatórios, para comparar atualizações incrementais.'''
+    def versions(seed: int, n: int = 400):
+        rng = np.random.default_rng(seed)
+        old = random_catalog(rng, n)
+        return old, random_change(rng, old)
+    return versions
+
+
+@pytest.fixture
+def api_client(tmp_path, monkeypatch):
+    '''
+    TestClient do app com um catálogo próprio (60 livros aleatórios em
+    tmp_path/data), com o limite de logins (3 tentativas) também em tmp_path e
+    sem gravar logs no banco. O CatalogHolder usado fica em `client.catalog`.
+    '''
+    from fastapi.testclient import TestClient
+
+    import api
+    import storage
+    from auth_utils import LoginThrottle
+    from cache_utils import ResponseCache
+    from catalog import CatalogHolder
+    from db_utils import log_writer
+
+    storage.write_dataset(random_catalog(np.random.default_rng(0), 60), str(tmp_path / 'data'))
+    holder = CatalogHolder(str(tmp_path / 'books.csv'), str(tmp_path / 'data'), poll_interval=3600)
+    holder.on_swap(api.warm_cache)
+    monkeypatch.setattr(api, 'catalog', holder)
+    monkeypatch.setattr(api, 'response_cache', ResponseCache())
+    monkeypatch.setattr(log_writer, 'submit', lambda endpoint, status_code: True)
+    monkeypatch.setattr(api, 'login_throttle', LoginThrottle(str(tmp_path / 'throttle.sqlite'), max_attempts=3))
+    with TestClient(api.app) as client:
+        client.catalog = holder
+        yield client
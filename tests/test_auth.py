@@ -0,0 +1,74 @@
+import multiprocessing
+import time
+
+from auth_utils import LoginThrottle, throttle_ip
+
+
+def test_throttle_ip_without_proxy():
+    assert throttle_ip('8.8.4.4', None) == '8.8.4.4'
+    assert throttle_ip(None, None) is None
+
+
+def test_throttle_ip_with_trusted_proxy():
+    # o uvicorn já trocou o host pelo IP do cliente vindo do X-Forwarded-For
+    assert throttle_ip('8.8.4.4', '8.8.4.4, 10.1.2.3') == '8.8.4.4'
+
+
+def test_throttle_ip_behind_router_uses_last_entry():
+    # o host é o do router (rede privada), que acrescenta o IP do cliente ao final
+    assert throttle_ip('10.1.2.3', '8.8.4.4') == '8.8.4.4'
+
+
+def test_forged_leftmost_entry_is_ignored():
+    # o cliente manda "6.6.6.6" e o router acrescenta o IP real
+    assert throttle_ip('10.1.2.3', '6.6.6.6, 8.8.4.4') == '8.8.4.4'
+    assert throttle_ip('10.1.2.3', '6.6.6.6, 8.8.4.4 ') == '8.8.4.4'
+
+
+def test_invalid_last_entry_falls_back_to_user_only():
+    assert throttle_ip('10.1.2.3', '8.8.4.4, unknown') is None
+
+
+def test_forged_header_from_public_client_keeps_ip():
+    assert throttle_ip('8.8.8.8', '8.8.4.4') == '8.8.8.8'
+
+
+def test_throttle_blocks_after_max_attempts(tmp_path):
+    throttle = LoginThrottle(str(tmp_path / 'throttle.sqlite'), max_attempts=2, window=60)
+    assert throttle.hit('user:a', 'ip:1') == 0
+    assert throttle.hit('user:b', 'ip:1') == 0
+    assert throttle.hit('user:c', 'ip:1') > 0
+    assert throttle.hit('user:c') == 0
+
+
+def test_throttle_reset_and_window(tmp_path):
+    throttle = LoginThrottle(str(tmp_path / 'throttle.sqlite'), max_attempts=1, window=0.2)
+    assert throttle.hit('user:a') == 0
+    assert 0 < throttle.hit('user:a') <= 0.2
+    throttle.reset('user:a')
+    assert throttle.hit('user:a') == 0
+    time.sleep(0.25)
+    assert throttle.hit('user:a') == 0
+
+
+def hit_many(path, attempts):
+    throttle = LoginThrottle(path, max_attempts=10, window=60)
+    return sum(throttle.hit('user:luca', 'ip:8.8.4.4') == 0 for _ in range(attempts))
+
+
+def test_throttle_is_shared_between_processes(tmp_path):
+    # como os workers do gunicorn: o limite vale para a soma dos processos
+    path = str(tmp_path / 'throttle.sqlite')
+    with multiprocessing.get_context('spawn').Pool(2) as pool:
+        allowed = pool.starmap(hit_many, [(path, 12), (path, 12)])
+    assert sum(allowed) == 10
+    assert LoginThrottle(path, max_attempts=10, window=60).hit('user:luca') > 0
+
+
+def test_login_is_throttled(api_client):
+    for _ in range(3):
+        response = api_client.post('/api/v1/auth/login', data={'username': 'ninguem', 'password': 'x'})
+        assert response.status_code == 400
+    response = api_client.post('/api/v1/auth/login', data={'username': 'ninguem', 'password': 'x'})
+    assert response.status_code == 429
+    assert int(response.headers['retry-after']) > 0
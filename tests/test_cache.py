@@ -0,0 +1,56 @@
+import json
+
+import numpy as np
+import pytest
+
+import storage
+from cache_utils import etag_matches
+from conftest import random_catalog
+
+CACHED_ROUTES = ['/api/v1/books', '/api/v1/categories', '/api/v1/stats/overview', '/api/v1/stats/categories']
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, False),
+    ('', False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ('"x", W/"abc"', True),
+    ('*', True),
+    ('"abcd"', False),
+    ('"x", "y"', False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"abc"') is expected
+
+
+@pytest.mark.parametrize('route', CACHED_ROUTES)
+def test_etag_and_not_modified(api_client, route):
+    response = api_client.get(route)
+    assert response.status_code == 200
+    etag = response.headers['etag']
+    assert response.headers['cache-control'] == 'no-cache'
+    assert api_client.get(route).content == response.content
+
+    for header in (etag, 'W/' + etag, f'"outro", {etag}', '*'):
+        not_modified = api_client.get(route, headers={'If-None-Match': header})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b''
+        assert not_modified.headers['etag'] == etag
+
+    assert api_client.get(route, headers={'If-None-Match': '"outro"'}).status_code == 200
+
+
+def test_new_version_changes_etag(api_client):
+    old = api_client.get('/api/v1/books')
+    assert len(old.json()) == 60
+
+    storage.write_dataset(random_catalog(np.random.default_rng(1), 70), api_client.catalog.storage_root)
+    assert api_client.catalog.reload_if_changed()
+
+    new = api_client.get('/api/v1/books', headers={'If-None-Match': old.headers['etag']})
+    assert new.status_code == 200
+    assert new.headers['etag'] != old.headers['etag']
+    assert len(json.loads(new.content)) == 70
+    assert api_client.get('/api/v1/books', headers={'If-None-Match': new.headers['etag']}).status_code == 304
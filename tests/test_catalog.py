@@ -0,0 +1,132 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+import api
+import storage
+from catalog import CatalogHolder
+from conftest import random_catalog
+
+
+def write_csv(path):
+    pd.DataFrame({
+        'id': ['a1', 'b2', 'c3'],
+        'title': ['Sharp Objects', 'A Light in the Attic', 'Tipping the Velvet'],
+        'category': ['Mystery', 'Poetry', 'Historical Fiction'],
+        'price': ['47.82', '51.77', None],
+        'rating': [4, 3, 1],
+        'availability': [20, 22, 20],
+        'image_links': ['a.jpg', 'b.jpg', 'c.jpg'],
+    }).to_csv(path, index=False)
+
+
+def test_csv_converted_once_at_startup(tmp_path):
+    csv_path, root = tmp_path / 'books.csv', tmp_path / 'data'
+    write_csv(csv_path)
+    holder = CatalogHolder(str(csv_path), str(root))
+
+    assert holder.reload_if_changed()
+    assert storage.has_dataset(str(root))
+    assert holder.source()[0] == 'storage'
+    store = holder.current()
+    assert store.get('a1').price == 47.82
+    assert not holder.reload_if_changed()
+
+
+def test_csv_fallback_uses_storage_schema(tmp_path, monkeypatch):
+    csv_path, root = tmp_path / 'books.csv', tmp_path / 'data'
+    write_csv(csv_path)
+
+    def read_only(df, root):
+        raise PermissionError('somente leitura')
+
+    monkeypatch.setattr(storage, 'write_dataset', read_only)
+    holder = CatalogHolder(str(csv_path), str(root))
+
+    assert holder.reload_if_changed()
+    assert holder.source()[0] == 'csv'
+    frame = holder.current().frame
+    assert {column: str(frame[column].dtype) for column in ('category', 'price', 'rating', 'availability')} == {
+        'category': 'category', 'price': 'float64', 'rating': 'int8', 'availability': 'int32',
+    }
+    assert holder.current().get('a1').price == 47.82
+
+
+def publish(root, seed, n=50):
+    return storage.write_dataset(random_catalog(np.random.default_rng(seed), n), str(root))
+
+
+def test_new_version_is_swapped_in(tmp_path):
+    root = tmp_path / 'data'
+    first_version = publish(root, seed=0)
+    holder = CatalogHolder(str(tmp_path / 'books.csv'), str(root))
+    seen = []
+    # o callback roda antes da troca: o snapshot atual ainda é o anterior
+    holder.on_swap(lambda store: seen.append((store.version, holder.current())))
+    assert holder.reload_if_changed()
+    before = holder.current()
+    assert before.version == first_version
+
+    second_version = publish(root, seed=1, n=70)
+    assert holder.reload_if_changed()
+    after = holder.current()
+    assert after.version == second_version and len(after) == 70
+    assert seen == [(first_version, None), (second_version, before)]
+
+    # quem pegou o snapshot antes da troca continua na versão antiga, inteira
+    assert before.version == first_version
+    assert len(before) == 50 and len(list(before.iter_records())) == 50
+    assert before.stats.overview()['total de livros'] == 50
+    assert not holder.reload_if_changed()
+
+
+def test_watcher_picks_up_new_version(tmp_path):
+    root = tmp_path / 'data'
+    publish(root, seed=0)
+    holder = CatalogHolder(str(tmp_path / 'books.csv'), str(root), poll_interval=0.05)
+    holder.reload_if_changed()
+    holder.start_watching()
+    try:
+        version = publish(root, seed=1)
+        deadline = time.monotonic() + 5
+        while holder.current().version != version:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        holder.stop_watching()
+
+
+def test_watcher_only_notifies_when_asked(tmp_path):
+    # modo do master do gunicorn: a thread avisa uma vez por versão e não carrega nada
+    root = tmp_path / 'data'
+    first = publish(root, seed=0)
+    holder = CatalogHolder(str(tmp_path / 'books.csv'), str(root), poll_interval=0.05)
+    holder.reload_if_changed()
+    notified = []
+    holder.start_watching(on_change=lambda: notified.append(time.monotonic()))
+    try:
+        publish(root, seed=1)
+        deadline = time.monotonic() + 5
+        while not notified:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        time.sleep(0.3)
+        assert len(notified) == 1
+        assert holder.current().version == first
+    finally:
+        holder.stop_watching()
+    assert holder.reload_if_changed()
+
+
+def test_swap_warms_response_cache(api_client):
+    old_etag = api_client.get('/api/v1/categories').headers['etag']
+    version = publish(api_client.catalog.storage_root, seed=5)
+    assert api_client.catalog.reload_if_changed()
+
+    # as respostas da nova versão já estão serializadas antes da primeira requisição
+    entries = api.response_cache._entries
+    assert api.response_cache._version == version
+    assert set(entries) == set(api.CACHED_RESPONSES)
+    response = api_client.get('/api/v1/categories')
+    assert response.headers['etag'] == entries['categories'][1] != old_etag
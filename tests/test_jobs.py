@@ -0,0 +1,120 @@
+import asyncio
+import fcntl
+import threading
+import time
+
+import api
+import jobs
+from auth_utils import get_current_user
+from jobs import JobManager
+
+
+class BlockingTarget:
+    '''Scraping falso que só termina quando `finish` é marcado.'''
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.finish = threading.Event()
+
+    def __call__(self, progress=None):
+        progress.incr('pages_fetched', 3)
+        self.started.set()
+        self.finish.wait(5)
+        return 1.5
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def managers(tmp_path, target):
+    # dois JobManagers com arquivos próprios fazem o papel de dois workers
+    paths = dict(lock_path=str(tmp_path / 'scraping.lock'), state_path=str(tmp_path / 'jobs.json'))
+    return JobManager(target, **paths), JobManager(target, **paths)
+
+
+def test_trigger_on_other_worker_returns_running_job(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'PUBLISH_INTERVAL', 0.01)
+    target = BlockingTarget()
+    first, second = managers(tmp_path, target)
+
+    job, created = first.submit()
+    assert created
+    target.started.wait(5)
+
+    remote, created = second.submit()
+    assert not created
+    assert remote.id == job.id
+    assert remote.active
+    wait_for(lambda: second.get(job.id).pages_fetched == 3)
+
+    target.finish.set()
+    wait_for(lambda: second.get(job.id).status == jobs.SUCCESS)
+    assert second.get(job.id).duration == 1.5
+
+    # com o lock livre, o próximo trigger cria um job no worker que o recebeu
+    target.finish.clear()
+    new_job, created = second.submit()
+    assert created and new_job.id != job.id
+    assert first.get(new_job.id).id == new_job.id
+    assert first.get(job.id).status == jobs.SUCCESS
+    target.finish.set()
+    wait_for(lambda: not first.get(new_job.id).active)
+
+
+def test_job_of_dead_process_is_reported_failed(tmp_path):
+    target = BlockingTarget()
+    first, second = managers(tmp_path, target)
+    job, _ = first.submit()
+    target.started.wait(5)
+
+    # o estado publicado continua "running", mas o lock foi liberado sem o estado final
+    state = job.to_state()
+    target.finish.set()
+    wait_for(lambda: not job.active)
+    first._publish(jobs.ScrapeJob.from_state(state))
+
+    stale = second.get(job.id)
+    assert stale.status == jobs.FAILED
+    assert stale.error
+
+
+def test_unknown_job(tmp_path):
+    first, second = managers(tmp_path, BlockingTarget())
+    assert second.get('nope') is None
+
+
+def test_routes_do_not_block_the_event_loop(api_client, tmp_path, monkeypatch):
+    manager = JobManager(BlockingTarget(), lock_path=str(tmp_path / 'scraping.lock'),
+                         state_path=str(tmp_path / 'jobs.json'))
+    monkeypatch.setattr(api, 'scraping_jobs', manager)
+    monkeypatch.setattr(jobs, 'SHARED_WAIT', 0.3)
+    api.app.dependency_overrides[get_current_user] = lambda: 'luca'
+    try:
+        calls = []
+
+        def in_thread(method):
+            def wrapper(*args):
+                try:
+                    asyncio.get_running_loop()
+                    calls.append('event loop')
+                except RuntimeError:
+                    calls.append('thread')
+                return method(*args)
+            return wrapper
+
+        monkeypatch.setattr(manager, 'submit', in_thread(manager.submit))
+        monkeypatch.setattr(manager, 'get', in_thread(manager.get))
+
+        # outro processo com o lock e sem estado publicado: o submit espera e desiste
+        with open(tmp_path / 'scraping.lock', 'a') as held:
+            fcntl.flock(held, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            response = api_client.get('/api/v1/scraping/trigger')
+        assert response.status_code == 500
+        assert api_client.get('/api/v1/scraping/jobs/nope').status_code == 404
+        assert calls == ['thread', 'thread']
+    finally:
+        api.app.dependency_overrides.clear()
@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+
+import db_utils
+from metrics import MetricsRegistry, archive, registry
+
+
+def test_log_writer_stats_in_prometheus(monkeypatch):
+    monkeypatch.setattr(db_utils.log_writer, 'dropped', 7)
+    monkeypatch.setattr(db_utils.log_writer, 'failed', 2)
+    text = registry.prometheus()
+    assert '# TYPE log_writer_queued gauge' in text
+    assert '# TYPE log_writer_dropped_total counter' in text
+    assert '\nlog_writer_dropped_total 7\n' in text
+    assert '\nlog_writer_failed_total 2\n' in text
+    assert '\nlog_writer_written_total 0\n' in text
+
+
+def test_failing_collector_does_not_break_exposition():
+    metrics = MetricsRegistry()
+
+    def broken():
+        raise RuntimeError('fora do ar')
+
+    metrics.add_collector(broken)
+    metrics.add_collector(lambda: [('up', 'gauge', 'Processo no ar', 1)])
+    metrics.observe_request('GET', '/api/v1/health', 200, 0.002, 10, {})
+    text = metrics.prometheus()
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/v1/health",status="200"} 1' in text
+    assert text.endswith('# TYPE up gauge\nup 1\n')
+
+
+def serve_requests(directory, requests):
+    # um "worker": registra as requisições e grava o arquivo dele no diretório
+    metrics = MetricsRegistry(directory)
+    metrics.add_collector(lambda: [('jobs_total', 'counter', 'Jobs', requests),
+                                   ('queued', 'gauge', 'Na fila', 1)])
+    for _ in range(requests):
+        metrics.observe_request('GET', '/api/v1/books', 200, 0.004, 100, {'consulta': 0.001})
+    metrics.flush()
+    return os.getpid()
+
+
+def test_metrics_are_summed_across_workers(tmp_path):
+    with multiprocessing.get_context('spawn').Pool(2) as pool:
+        pids = pool.starmap(serve_requests, [(str(tmp_path), 3), (str(tmp_path), 5)])
+    metrics = MetricsRegistry(str(tmp_path))
+    text = metrics.prometheus()
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/v1/books",status="200"} 8' in text
+    assert '\njobs_total 8\n' in text
+    assert '\nqueued 2\n' in text
+    [row] = metrics.summary()
+    assert row['requisições'] == 8
+    assert row['etapas (ms médios)'] == {'consulta': 1.0}
+
+    # o master arquiva um worker encerrado: os contadores não voltam para trás
+    archive(pids[0], str(tmp_path))
+    text = metrics.prometheus()
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/v1/books",status="200"} 8' in text
+    assert '\njobs_total 8\n' in text
+    assert '\nqueued 1\n' in text
+    assert not os.path.exists(tmp_path / f'{pids[0]}.json')
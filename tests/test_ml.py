@@ -0,0 +1,118 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import api
+from ml_model import MicroBatcher, feature_matrix
+
+ROWS = [[3, 1], [0, 5], [22, 4], [7, 2]]
+
+
+class CountingModel:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, X):
+        self.calls.append(X.copy())
+        return X[:, 0] * 10 + X[:, 1]
+
+
+def test_concurrent_rows_are_merged_in_order():
+    predict = CountingModel()
+    batcher = MicroBatcher(predict, max_batch=256, max_delay=0.01)
+
+    async def main():
+        return await asyncio.gather(*(batcher.predict(row) for row in ROWS))
+
+    assert asyncio.run(main()) == [31.0, 5.0, 224.0, 72.0]
+    assert len(predict.calls) == 1
+    np.testing.assert_array_equal(predict.calls[0], ROWS)
+
+
+def test_full_batch_is_flushed_without_waiting():
+    predict = CountingModel()
+    batcher = MicroBatcher(predict, max_batch=3, max_delay=10)
+
+    async def main():
+        return await asyncio.wait_for(asyncio.gather(*(batcher.predict(row) for row in ROWS[:3])), 1)
+
+    assert asyncio.run(main()) == [31.0, 5.0, 224.0]
+    assert len(predict.calls) == 1
+
+
+def test_failure_reaches_every_caller():
+    def broken(X):
+        raise RuntimeError('modelo quebrado')
+
+    batcher = MicroBatcher(broken)
+
+    async def main():
+        return await asyncio.gather(*(batcher.predict(row) for row in ROWS), return_exceptions=True)
+
+    assert [str(result) for result in asyncio.run(main())] == ['modelo quebrado'] * len(ROWS)
+
+
+def test_feature_matrix_accepts_objects_and_lists():
+    X = feature_matrix([{'feature1': 3, 'feature2': 1}, [0, 5]])
+    np.testing.assert_array_equal(X, [[3, 1], [0, 5]])
+    assert feature_matrix([]).shape == (0, 2)
+
+
+@pytest.mark.parametrize('rows', [
+    [[1, 2], [3]],                        # irregular
+    [[1, 2, 3]],                          # largura errada
+    [[1, 2, 3, 4]],                       # largura errada, mas com o dobro de valores
+    [1, 2],                               # linha que não é lista
+    [['a', 2]],                           # não numérico
+    [[float('nan'), 1]],                  # NaN
+    [[None, 1]],
+    [{'feature1': 1}],                    # feature ausente
+    [{'feature1': [1, 2], 'feature2': 3}],
+])
+def test_feature_matrix_rejects_malformed_rows(rows):
+    with pytest.raises((ValueError, TypeError, KeyError)):
+        feature_matrix(rows)
+
+
+def test_batch_endpoint_keeps_order(api_client):
+    expected = api.prediction_model().predict(np.array(ROWS, dtype=np.float64)).tolist()
+    rows = [{'feature1': a, 'feature2': b} if i % 2 else [a, b] for i, (a, b) in enumerate(ROWS)]
+    assert api_client.post('/api/v1/ml/predictions/batch', json=rows).json() == expected
+
+    ndjson = '\n'.join(json.dumps(row) for row in rows) + '\n'
+    response = api_client.post('/api/v1/ml/predictions/batch', content=ndjson,
+                               headers={'Content-Type': 'application/x-ndjson'})
+    assert response.json() == expected
+
+
+@pytest.mark.parametrize('body', [
+    '[[1, 2], [3]]',
+    '[[1, "a"]]',
+    '[[NaN, 1]]',
+    '[[1, 2, 3]]',
+    '{"feature1": 1, "feature2": 2}',
+    'não é json',
+])
+def test_batch_endpoint_rejects_malformed_rows(api_client, body):
+    response = api_client.post('/api/v1/ml/predictions/batch', content=body,
+                               headers={'Content-Type': 'application/json'})
+    assert response.status_code == 400
+    assert response.json()['detail'] == 'features inválidas'
+
+
+def test_single_prediction(api_client):
+    expected = api.prediction_model().predict([[3, 1]])[0]
+    response = api_client.post('/api/v1/ml/predictions', json={'feature1': 3, 'feature2': 1})
+    assert response.json() == f'predição para as features dadas: {expected}'
+
+
+def test_model_is_not_loaded_on_import():
+    code = 'import api; print(api.prediction_model.cache_info().currsize)'
+    result = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(api.__file__),
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == '0'
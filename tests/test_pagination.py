@@ -0,0 +1,87 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import storage
+from catalog import CatalogStore, encode_cursor
+from conftest import random_catalog
+
+
+def walk(client, limit, **params):
+    '''Percorre as páginas em JSON; retorna os itens e a quantidade de páginas.'''
+    items, cursor, pages = [], None, 0
+    while True:
+        query = {'limit': limit, **params}
+        if cursor:
+            query['cursor'] = cursor
+        body = client.get('/api/v1/books', params=query).json()
+        items += body['items']
+        pages += 1
+        cursor = body['next_cursor']
+        if cursor is None:
+            return items, pages
+        assert pages < 100
+
+
+@pytest.mark.parametrize('limit', [1, 7, 60, 1000])
+def test_json_pages_cover_the_catalog(api_client, limit):
+    everything = api_client.get('/api/v1/books').json()
+    items, pages = walk(api_client, limit)
+    assert items == everything
+    assert pages == -(-len(everything) // limit)
+
+
+def test_ndjson_pages_follow_next_cursor_header(api_client):
+    everything = [book['id'] for book in api_client.get('/api/v1/books').json()]
+    ids, cursor = [], None
+    while True:
+        params = {'limit': 25, 'format': 'ndjson', 'fields': 'id'}
+        if cursor:
+            params['cursor'] = cursor
+        response = api_client.get('/api/v1/books', params=params)
+        assert response.headers['content-type'] == 'application/x-ndjson'
+        ids += [json.loads(line)['id'] for line in response.text.splitlines()]
+        cursor = response.headers.get('x-next-cursor')
+        if cursor is None:
+            break
+    assert ids == everything
+
+
+def test_fields_projection(api_client):
+    items = api_client.get('/api/v1/books', params={'fields': ' id , price', 'limit': 3}).json()['items']
+    assert [sorted(item) for item in items] == [['id', 'price']] * 3
+
+
+@pytest.mark.parametrize('fields', ['id,nope', ',', 'Title'])
+def test_invalid_fields(api_client, fields):
+    response = api_client.get('/api/v1/books', params={'fields': fields})
+    assert response.status_code == 400
+    assert 'campos inválidos' in response.json()['detail']
+
+
+@pytest.mark.parametrize('cursor', ['@@@', encode_cursor('nao-existe', 3)])
+def test_invalid_cursor(api_client, cursor):
+    assert api_client.get('/api/v1/books', params={'cursor': cursor}).status_code == 400
+
+
+def test_duplicate_ids_do_not_loop(api_client):
+    frame = random_catalog(np.random.default_rng(2), 30)
+    # o books.csv não é deduplicado: o mesmo id aparece no fim de várias páginas
+    frame = pd.concat([frame, frame.iloc[:10]], ignore_index=True)
+    storage.write_dataset(frame, api_client.catalog.storage_root)
+    api_client.catalog.reload_if_changed()
+
+    # a 5ª página termina na posição 34, cópia da posição 4
+    items, pages = walk(api_client, 7, fields='id')
+    assert [item['id'] for item in items] == frame['id'].tolist()
+    assert pages == 6
+
+
+def test_cursor_from_previous_version_continues_after_the_same_id(catalog_versions):
+    old_frame, new_frame = catalog_versions(3)
+    old, new = CatalogStore(old_frame), CatalogStore(new_frame)
+    book = next(record for record in old.records if new.get(record.id) is not None)
+    cursor = encode_cursor(book.id, old.records.index(book))
+    assert new.position_after(cursor) == new.by_id[book.id] + 1
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+import parsers
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+BASE_URL = 'https://books.toscrape.com/'
+CATEGORY_URL = BASE_URL + 'catalogue/category/books/mystery_3/index.html'
+
+
+def read(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('backend', sorted(parsers.BACKENDS))
+def test_parse_book(backend):
+    category_page = BASE_URL + 'catalogue/category/books/poetry_23/index.html'
+    assert parsers.parse_book(read('a-light-in-the-attic_1000.html'), category_page, BASE_URL, backend) == (
+        'a897fe39b1053632', 'A Light in the Attic', 'poetry', '51.77', 3, 22,
+        BASE_URL + 'media/cache/fe/72/fe72f0532301ec28892ae79a629a293c.jpg',
+    )
+
+
+@pytest.mark.parametrize('backend', sorted(parsers.BACKENDS))
+def test_parse_category_page_with_next(backend):
+    urls, next_url = parsers.parse_category_page(read('mystery_3-page-1.html'), CATEGORY_URL, BASE_URL, backend)
+    assert urls[0] == (BASE_URL + 'catalogue/sharp-objects_997/index.html', CATEGORY_URL)
+    assert len(urls) == 4
+    assert next_url == BASE_URL + 'catalogue/category/books/mystery_3/page-2.html'
+
+
+@pytest.mark.parametrize('backend', sorted(parsers.BACKENDS))
+def test_parse_category_last_page(backend):
+    url = BASE_URL + 'catalogue/category/books/mystery_3/page-2.html'
+    urls, next_url = parsers.parse_category_page(read('mystery_3-page-2.html'), url, BASE_URL, backend)
+    assert len(urls) == 2
+    assert next_url is None
+
+
+@pytest.mark.parametrize('name', ['a-light-in-the-attic_1000.html'])
+def test_book_backends_agree(name):
+    html = read(name)
+    results = {backend: parsers.parse_book(html, CATEGORY_URL, BASE_URL, backend) for backend in parsers.BACKENDS}
+    assert len(set(results.values())) == 1, results
+
+
+@pytest.mark.parametrize('name', ['mystery_3-page-1.html', 'mystery_3-page-2.html'])
+def test_category_backends_agree(name):
+    html = read(name)
+    results = {backend: parsers.parse_category_page(html, CATEGORY_URL, BASE_URL, backend)
+               for backend in parsers.BACKENDS}
+    assert all(result == results['html.parser'] for result in results.values()), results
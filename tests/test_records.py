@@ -0,0 +1,54 @@
+import json
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import records
+from catalog import CatalogStore
+
+ENCODERS = ['stdlib'] + (['orjson'] if records.orjson is not None else [])
+
+
+@pytest.fixture(params=ENCODERS)
+def dumps(request, monkeypatch):
+    if request.param == 'stdlib':
+        monkeypatch.setattr(records, 'orjson', None)
+    return records.dumps
+
+
+@pytest.fixture
+def store():
+    return CatalogStore(pd.DataFrame({
+        'id': ['a1', 'b2'],
+        'title': ['Sharp Objects', 'Olá, café'],
+        'category': ['Mystery', 'Poetry'],
+        'price': [47.82, float('nan')],
+        'rating': [4, 3],
+        'availability': [20, 0],
+        'image_links': ['a.jpg', 'b.jpg'],
+    }))
+
+
+def test_records_nan_as_null(dumps, store):
+    body = json.loads(dumps(list(store.iter_records())))
+    assert body[1] == {'id': 'b2', 'title': 'Olá, café', 'category': 'Poetry', 'price': None,
+                       'rating': 3, 'availability': 0, 'image_links': 'b.jpg'}
+    assert body[0]['price'] == 47.82
+
+
+def test_projection_nan_as_null(dumps, store):
+    rows = list(store.iter_records(fields=['id', 'price']))
+    assert rows[1] == {'id': 'b2', 'price': None}
+    # uma linha por vez, como no NDJSON
+    assert [json.loads(dumps(row)) for row in rows] == [{'id': 'a1', 'price': 47.82}, {'id': 'b2', 'price': None}]
+
+
+def test_nested_floats_and_numpy_scalars(dumps):
+    content = {'média': math.nan, 'máximo': math.inf, 'valores': [1.5, np.float64('nan'), np.int64(3)], 1: 'ok'}
+    assert json.loads(dumps(content)) == {'média': None, 'máximo': None, 'valores': [1.5, None, 3], '1': 'ok'}
+
+
+def test_compact_utf8(dumps, store):
+    assert dumps({'título': 'Olá'}) == '{"título":"Olá"}'.encode('utf-8')
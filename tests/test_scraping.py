@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+import scraping
+from bench.fixture_server import generate, serve
+from checkpoint import CrawlCheckpoint
+
+BOOKS = 120
+
+
+@pytest.fixture(scope='module')
+def site(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('site'))
+    generate(directory, books=BOOKS, categories=4, per_page=20)
+    server, base_url = serve(directory)
+    yield base_url
+    server.shutdown()
+
+
+def crawl(checkpoint, base_url, timeout=30):
+    return asyncio.run(asyncio.wait_for(
+        scraping.crawl(checkpoint, base_url, concurrency=2, rate_limit=0), timeout))
+
+
+def test_crawl_writes_every_book(site, tmp_path):
+    checkpoint = CrawlCheckpoint(str(tmp_path / 'checkpoint.db'), site, resume=False)
+    crawl(checkpoint, site)
+    assert checkpoint.count() == BOOKS
+    checkpoint.close()
+
+
+def test_checkpoint_failure_stops_the_crawl(site, tmp_path, monkeypatch):
+    monkeypatch.setattr(scraping, 'CHECKPOINT_BATCH', 5)
+    checkpoint = CrawlCheckpoint(str(tmp_path / 'checkpoint.db'), site, resume=False)
+
+    def disk_full(batch):
+        raise OSError('disco cheio')
+
+    monkeypatch.setattr(checkpoint, 'add', disk_full)
+    # antes, o writer morria e os workers ficavam presos na fila cheia até o timeout
+    with pytest.raises(OSError, match='disco cheio'):
+        crawl(checkpoint, site, timeout=10)
+    checkpoint.close()
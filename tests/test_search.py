@@ -0,0 +1,42 @@
+import copy
+
+import pytest
+
+from catalog import CatalogStore, diff
+from search import SearchIndex
+
+QUERIES = ['river', 'riv', 'garden night', 'shadw', 'cafe', 'Story Fire', 'mountian king', 'zzz']
+
+
+def snapshot(index: SearchIndex) -> dict:
+    return copy.deepcopy({
+        'docs': index.docs,
+        'postings': index.postings,
+        'vocabulary': index.vocabulary,
+        'grams': index.grams,
+    })
+
+
+def results(index: SearchIndex) -> list:
+    # limite alto: empates de score não dependem da ordem de inserção
+    return [sorted(index.search(query, category, limit=1000))
+            for query in QUERIES for category in (None, 'Category 3', 'New Category')]
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_updated_matches_fresh_build(catalog_versions, seed):
+    old_frame, new_frame = catalog_versions(seed)
+    old, new = CatalogStore(old_frame), CatalogStore(new_frame)
+    changes = diff(old, new)
+    assert changes is not None
+
+    previous = SearchIndex(old.records)
+    before, before_results = snapshot(previous), results(previous)
+    updated = previous.updated(*changes)
+    fresh = SearchIndex(new.records)
+
+    assert snapshot(updated) == snapshot(fresh)
+    assert results(updated) == results(fresh)
+    # o índice anterior continua respondendo como antes
+    assert snapshot(previous) == before
+    assert results(previous) == before_results
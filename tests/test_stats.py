@@ -0,0 +1,36 @@
+import copy
+
+import pytest
+
+from catalog import CatalogStore, diff
+from stats import CatalogStats
+
+
+def snapshot(stats: CatalogStats) -> dict:
+    groups = {'overall': stats.overall, **stats.by_category}
+    return copy.deepcopy({
+        'overview': stats.overview(),
+        'categories': stats.categories(),
+        'groups': {name: (group.count, group.prices, group.ratings, group.stock_total, group.in_stock)
+                   for name, group in groups.items()},
+    })
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_updated_matches_fresh_build(catalog_versions, seed):
+    old_frame, new_frame = catalog_versions(seed)
+    old, new = CatalogStore(old_frame), CatalogStore(new_frame)
+    changes = diff(old, new)
+    assert changes is not None
+
+    previous = CatalogStats(old.records)
+    before = snapshot(previous)
+    updated = previous.updated(*changes)
+    fresh = CatalogStats(new.records)
+
+    assert updated.overview() == fresh.overview()
+    assert updated.categories() == fresh.categories()
+    assert 'Category 0' not in updated.categories()
+    assert 'New Category' in updated.categories()
+    # o snapshot anterior continua servindo os mesmos números
+    assert snapshot(previous) == before
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import storage
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 50, 1000])
+def test_write_frames_matches_whole_dataset(tmp_path, catalog_versions, chunk_size):
+    frame, _ = catalog_versions(seed=chunk_size)
+    # os pedaços do checkpoint trazem o preço como texto
+    frame['price'] = frame['price'].map(lambda price: None if price != price else f'{price:.2f}')
+    chunks = [frame.iloc[start:start + chunk_size] for start in range(0, len(frame), chunk_size)]
+
+    version = storage.write_frames(iter(chunks), str(tmp_path / 'chunks'))
+    loaded, loaded_version = storage.load_dataset(str(tmp_path / 'chunks'), mmap=False)
+
+    expected = storage.coerce_schema(frame)
+    assert version == loaded_version == storage.dataset_version(expected)
+    assert storage.write_dataset(frame, str(tmp_path / 'whole')) == version
+    pd.testing.assert_frame_equal(loaded, storage.load_dataset(str(tmp_path / 'whole'), mmap=False)[0])
+    assert loaded['category'].astype(str).tolist() == expected['category'].astype(str).tolist()
+    np.testing.assert_array_equal(loaded['price'].to_numpy(), expected['price'].to_numpy())
+
+
+def test_write_frames_without_rows(tmp_path):
+    empty = pd.DataFrame({column: [] for column in storage.SCHEMA})
+    storage.write_frames([], str(tmp_path))
+    loaded, version = storage.load_dataset(str(tmp_path))
+    assert len(loaded) == 0
+    assert version == storage.dataset_version(storage.coerce_schema(empty))
@@ -0,0 +1,109 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import random_catalog
+from training import FEATURE_COLUMNS, TRAINING_COLUMNS, TrainingSplit, formats, iter_export
+
+# arrow só com o pyarrow instalado
+FORMATS = formats()
+
+
+def parse(body: bytes, format: str) -> pd.DataFrame:
+    '''Lê de volta uma exportação num DataFrame.'''
+    if format == 'json':
+        return pd.DataFrame(json.loads(body))
+    if format == 'ndjson':
+        return pd.DataFrame([json.loads(line) for line in body.splitlines()])
+    if format == 'csv':
+        return pd.read_csv(io.BytesIO(body))
+    import pyarrow.ipc
+    return pyarrow.ipc.open_stream(body).read_all().to_pandas()
+
+
+def export(frame, positions, columns, format, chunk_size) -> bytes:
+    return b''.join(part if isinstance(part, bytes) else part.encode('utf-8')
+                    for part in iter_export(frame, positions, columns, format, chunk_size))
+
+
+def expected(frame, positions, columns) -> pd.DataFrame:
+    result = frame[list(columns.values())].iloc[positions].reset_index(drop=True)
+    result.columns = list(columns)
+    return result
+
+
+@pytest.fixture
+def frame():
+    return random_catalog(np.random.default_rng(7), 300)
+
+
+def test_split_is_stable_and_disjoint(frame):
+    split = TrainingSplit(frame)
+    again = TrainingSplit(frame.copy())
+    for name in ('train', 'validation', 'all'):
+        np.testing.assert_array_equal(split.splits[name], again.splits[name])
+
+    train, validation = set(split.splits['train']), set(split.splits['validation'])
+    assert not train & validation
+    labeled = set(np.flatnonzero(frame['price'].notna()))
+    assert train | validation == labeled == set(split.splits['all'])
+    assert 0.1 < len(validation) / len(labeled) < 0.3
+
+
+def test_split_follows_the_id_across_versions(frame):
+    split = TrainingSplit(frame)
+    # outra versão: ordem diferente e alguns livros a mais
+    other = pd.concat([frame.iloc[::-1], random_catalog(np.random.default_rng(8), 20, start=1000)],
+                      ignore_index=True)
+    other_split = TrainingSplit(other)
+    for name in ('train', 'validation'):
+        ids = set(frame['id'].iloc[split.splits[name]])
+        other_ids = set(other['id'].iloc[other_split.splits[name]])
+        assert ids == other_ids & set(frame['id'])
+
+
+@pytest.mark.parametrize('format', FORMATS)
+@pytest.mark.parametrize('columns', [TRAINING_COLUMNS, FEATURE_COLUMNS])
+def test_formats_round_trip(frame, format, columns):
+    positions = TrainingSplit(frame).splits['train']
+    body = export(frame, positions, columns, format, chunk_size=37)
+    pd.testing.assert_frame_equal(parse(body, format), expected(frame, positions, columns), check_dtype=False)
+
+
+@pytest.mark.parametrize('format', FORMATS)
+def test_empty_export(frame, format):
+    body = export(frame, np.array([], dtype=np.int64), TRAINING_COLUMNS, format, chunk_size=10)
+    result = parse(body, format)
+    assert len(result) == 0
+    if format in ('csv', 'arrow'):
+        assert list(result.columns) == list(TRAINING_COLUMNS)
+
+
+@pytest.mark.parametrize('format', FORMATS)
+def test_offset_limit_chunks_concatenate_to_full_export(api_client, format):
+    route = '/api/v1/ml/training-data'
+    full = api_client.get(route, params={'split': 'all', 'format': format})
+    version = full.headers['x-dataset-version']
+    total = int(full.headers['x-total-count'])
+
+    parts, offset = [], 0
+    while True:
+        response = api_client.get(route, params={'split': 'all', 'format': format, 'offset': offset,
+                                                 'limit': 7, 'version': version})
+        assert response.status_code == 200
+        parts.append(parse(response.content, format))
+        if 'x-next-offset' not in response.headers:
+            break
+        offset = int(response.headers['x-next-offset'])
+
+    assert len(parts) == -(-total // 7)
+    pd.testing.assert_frame_equal(pd.concat(parts, ignore_index=True), parse(full.content, format),
+                                  check_dtype=False)
+
+
+def test_changed_version_is_rejected(api_client):
+    response = api_client.get('/api/v1/ml/training-data', params={'offset': 7, 'version': 'outra'})
+    assert response.status_code == 409
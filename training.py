@@ -0,0 +1,130 @@
+'''
+Esse módulo exporta os dados para treinamento (/ml/training-data) e as
+features (/ml/features) em streaming, sem montar a lista inteira em memória.
+
+A divisão treino/validação é determinística: cada livro é sorteado pelo hash
+do seu id com uma semente fixa, então o mesmo livro cai sempre no mesmo
+conjunto (inclusive entre versões do dataset) e a ordem das linhas é sempre a
+mesma. As posições de cada conjunto são calculadas uma vez por versão.
+
+Formatos de saída, enviados em pedaços de EXPORT_CHUNK_SIZE linhas:
+
+    -json: array de objetos (o formato original dos endpoints)
+    -ndjson: um objeto por linha
+    -csv: com cabeçalho
+    -arrow: stream IPC do Apache Arrow (requer o pacote pyarrow, importado só
+     no primeiro download nesse formato)
+
+Com `offset` e `limit` o cliente pode retomar um download interrompido: as
+posições são estáveis enquanto a versão do dataset não mudar.
+'''
+
+import importlib.util
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+# só verifica se o pacote existe, sem importá-lo
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+SEED = int(os.getenv('TRAINING_SEED', 42))
+VALIDATION_FRACTION = float(os.getenv('TRAINING_VALIDATION_FRACTION', 0.2))
+EXPORT_CHUNK_SIZE = 10000
+
+# nome da coluna exportada -> coluna do dataset
+TRAINING_COLUMNS = {'x1_availability': 'availability', 'x2_rating': 'rating', 'y_labels_price': 'price'}
+FEATURE_COLUMNS = {'x1_availability': 'availability', 'x2_rating': 'rating'}
+
+MEDIA_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+
+def formats() -> list[str]:
+    '''Formatos disponíveis (arrow só com o pyarrow instalado).'''
+    return [name for name in MEDIA_TYPES if name != 'arrow' or HAS_PYARROW]
+
+
+class TrainingSplit:
+    '''Posições (no DataFrame do snapshot) dos livros de treino e de validação.'''
+
+    def __init__(self, frame: pd.DataFrame, seed: int = SEED, validation_fraction: float = VALIDATION_FRACTION):
+        ids = frame['id'].astype(str)
+        hashes = pd.util.hash_pandas_object(ids, index=False, hash_key=f'{seed:016d}'[-16:]).to_numpy()
+        # só entram livros com label
+        labeled = frame['price'].notna().to_numpy()
+        order = np.argsort(hashes, kind='stable')
+        order = order[labeled[order]]
+        is_validation = hashes[order] < np.uint64(validation_fraction * 2 ** 64)
+        self.splits = {
+            'train': order[~is_validation],
+            'validation': order[is_validation],
+            'all': order,
+        }
+
+
+def frame_chunks(frame: pd.DataFrame, positions, columns: dict, chunk_size: int = EXPORT_CHUNK_SIZE):
+    '''DataFrames de até chunk_size linhas, com as colunas já renomeadas.'''
+    source = frame[list(columns.values())]
+    for start in range(0, len(positions), chunk_size):
+        chunk = source.iloc[positions[start:start + chunk_size]]
+        chunk.columns = list(columns)
+        yield chunk
+
+
+def records_json(chunk: pd.DataFrame) -> str:
+    # NaN vira null (o JSONResponse não aceitaria NaN)
+    return chunk.to_json(orient='records', lines=True, force_ascii=False, double_precision=15)
+
+
+def iter_export(frame: pd.DataFrame, positions, columns: dict, format: str, chunk_size: int = EXPORT_CHUNK_SIZE):
+    '''Serializa as linhas das posições dadas, sob demanda, no formato pedido.'''
+    chunks = frame_chunks(frame, positions, columns, chunk_size)
+
+    if format == 'ndjson':
+        for chunk in chunks:
+            yield records_json(chunk).rstrip('\n') + '\n'
+
+    elif format == 'json':
+        yield '['
+        separator = ''
+        for chunk in chunks:
+            yield separator + ','.join(records_json(chunk).splitlines())
+            separator = ','
+        yield ']'
+
+    elif format == 'csv':
+        header = True
+        for chunk in chunks:
+            yield chunk.to_csv(index=False, header=header)
+            header = False
+        if header:  # nenhuma linha: envia só o cabeçalho
+            yield ','.join(columns) + '\n'
+
+    elif format == 'arrow':
+        import pyarrow as pa
+        import pyarrow.ipc
+
+        schema = pa.Schema.from_pandas(frame[list(columns.values())].head(0).set_axis(list(columns), axis=1),
+                                       preserve_index=False)
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, schema) as writer:
+            for chunk in chunks:
+                writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+                yield drain(sink)
+        yield drain(sink)
+
+    else:
+        raise ValueError(f'formato desconhecido: {format}')
+
+
+def drain(buffer: io.BytesIO) -> bytes:
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data